@@ -0,0 +1,95 @@
+import os
+import contextlib
+from pathlib import Path, PurePath
+
+""" Finds asset files by name, case insensitive, since LRR data mixes cases freely.
+Every search directory is listed once and looked up in memory afterwards, so resolving
+a file or the frames of an image sequence does not stat any files. """
+
+""" Directory listings shared by all imports of the running session, None outside of a session """
+listings = None
+
+@contextlib.contextmanager
+def session():
+    """ Shares directory listings between all resolvers created inside, e.g. for all objects of a scene.
+    Nested sessions use the outer one. Files added while a session runs are not seen """
+    global listings
+    if listings is not None:
+        yield
+        return
+    
+    listings = {}
+    try:
+        yield
+    finally:
+        listings = None
+
+def list_dir(dir, cache):
+    """ Returns a dict from lower case name to actual name of every entry in dir.
+    Missing or unreadable directories are empty """
+    key = os.path.abspath(dir)
+    index = cache.get(key)
+    if index is None:
+        index = {}
+        try:
+            with os.scandir(key) as it:
+                for entry in it:
+                    index.setdefault(entry.name.lower(), entry.name)
+        except OSError:
+            pass
+        cache[key] = index
+    return index
+
+class AssetResolver:
+    
+    def __init__(self, dirs, wad = None, archive_dirs = ()):
+        """ Directories on disk in search order, empty ones are skipped.
+        archive_dirs are directories inside the WAD archive, e.g. of a model read from it.
+        They are searched first and only in the archive, never on disk """
+        self.dirs = [Path(x) for x in dirs if x]
+        self.wad = wad
+        self.archive_dirs = [PurePath(x) for x in archive_dirs] if wad else []
+        
+        """ Listings used outside of a session """
+        self.listings = {}
+    
+    def listing(self, dir):
+        return list_dir(dir, listings if listings is not None else self.listings)
+    
+    def find(self, name):
+        """ Looks for name in each of the directories, on disk first and then in the WAD archive.
+        Returns a Path with the actual case of the file, a WadEntry or None """
+        for dir in self.archive_dirs:
+            entry = self.wad.find(dir.joinpath(name))
+            if entry:
+                return entry
+        
+        lower = name.lower()
+        for dir in self.dirs:
+            actual = self.listing(dir).get(lower)
+            if actual is not None:
+                return dir.joinpath(actual)
+            
+            if self.wad:
+                entry = self.wad.find(PurePath(dir).joinpath(name))
+                if entry:
+                    return entry
+        
+        return None
+    
+    def sequence_length(self, path, match):
+        """ Returns the amount of consecutive frames of an image sequence on disk, starting at path.
+        match is the match of the file name, with the frame number as first group """
+        index = self.listing(path.parent)
+        name = path.name
+        
+        start = int(match.group(1))
+        digitSpan = match.span(1)
+        pad = digitSpan[1] - digitSpan[0]
+        prefix = name[:digitSpan[0]].lower()
+        postfix = name[digitSpan[1]:].lower()
+        
+        frame = start
+        while f"{prefix}{str(frame).zfill(pad)}{postfix}" in index:
+            frame += 1
+        return frame - start
@@ -0,0 +1,160 @@
+""" Parses every LWS, LWO, UV and BMP file below the given folders in a process pool and reports
+parse times, failures and throughput. Blender is not needed, run it as a script:
+
+    python AssetSweep.py <folder> [<folder> ...] [--workers N] [--verbose]
+"""
+import io
+import os
+import sys
+import time
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from . import LwoLoad
+    from . import LwsLoad
+    from . import UvLoad
+    from . import BmpLoad
+    from . import ParseCache
+except ImportError:
+    import LwoLoad
+    import LwsLoad
+    import UvLoad
+    import BmpLoad
+    import ParseCache
+
+""" Loader for each file extension """
+loaders = {
+    ".lwo": LwoLoad.load_lwo,
+    ".lws": LwsLoad.load_lws,
+    ".uv": UvLoad.load_uv,
+    ".bmp": BmpLoad.load_bmp
+    }
+
+class SweepResult:
+    
+    def __init__(self, path, size, seconds, error, chunk_stats = None):
+        self.path = path
+        self.size = size
+        self.seconds = seconds
+        self.error = error
+        
+        """ LwoLoad.ParseStats of LWO files if chunk statistics are enabled """
+        self.chunk_stats = chunk_stats
+
+def find_assets(roots):
+    paths = []
+    for root in roots:
+        if os.path.isfile(root):
+            # Files given directly are skipped too, if there is no loader for them
+            if os.path.splitext(root)[1].lower() in loaders:
+                paths.append(root)
+            else:
+                print(f"Skipping {root}, no loader for this file type")
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if os.path.splitext(name)[1].lower() in loaders:
+                    paths.append(os.path.join(dirpath, name))
+    return paths
+
+""" Set in each worker by init_worker """
+record_chunk_stats = False
+
+def init_worker(use_cache, chunk_stats):
+    global record_chunk_stats
+    if not use_cache:
+        ParseCache.configure(None)
+    record_chunk_stats = chunk_stats
+
+def parse_file(path):
+    """ Runs in a worker process """
+    loader = loaders[os.path.splitext(path)[1].lower()]
+    
+    size = 0
+    error = None
+    if record_chunk_stats:
+        LwoLoad.enable_stats()
+    start = time.perf_counter()
+    try:
+        size = os.path.getsize(path)
+        # The loaders print notes about unknown chunks, keep them out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            loader(path)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - start
+    
+    return SweepResult(path, size, seconds, error, LwoLoad.disable_stats())
+
+def sweep(paths, workers = None, use_cache = False, chunk_stats = False):
+    """ Parses all paths and returns a SweepResult for each, in the same order """
+    if workers == 1:
+        init_worker(use_cache, chunk_stats)
+        return [parse_file(x) for x in paths]
+    
+    with ProcessPoolExecutor(max_workers = workers, initializer = init_worker, initargs = (use_cache, chunk_stats)) as pool:
+        return list(pool.map(parse_file, paths, chunksize = 16))
+
+def print_report(results, seconds, verbose = False, slowest = 10):
+    failed = [x for x in results if x.error]
+    total_size = sum(x.size for x in results)
+    
+    if verbose:
+        for x in results:
+            print(f"{x.seconds * 1000:10.2f} ms  {x.path}")
+    
+    if slowest > 0 and results:
+        print(f"Slowest {min(slowest, len(results))} files:")
+        for x in sorted(results, key = lambda x: x.seconds, reverse = True)[:slowest]:
+            print(f"{x.seconds * 1000:10.2f} ms  {x.path}")
+    
+    if failed:
+        print(f"Failed {len(failed)} files:")
+        for x in failed:
+            print(f"  {x.path}: {x.error}")
+    
+    print("Per type:")
+    for ext in loaders:
+        typed = [x for x in results if os.path.splitext(x.path)[1].lower() == ext]
+        if typed:
+            parse_time = sum(x.seconds for x in typed)
+            print(f"  {ext:5} {len(typed):8} files {parse_time:10.3f} s parse time {parse_time / len(typed) * 1000:10.3f} ms per file")
+    
+    chunk_stats = [x.chunk_stats for x in results if x.chunk_stats]
+    if chunk_stats:
+        total = LwoLoad.ParseStats()
+        for x in chunk_stats:
+            total.merge(x)
+        print("LWO chunk statistics:")
+        print(total.report())
+    
+    megabytes = total_size / (1024 * 1024)
+    print(f"Parsed {len(results)} files ({megabytes:.2f} MB), {len(failed)} failed, in {seconds:.3f} s")
+    if seconds > 0:
+        print(f"Throughput: {len(results) / seconds:.1f} files/s, {megabytes / seconds:.2f} MB/s")
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Parses LRR assets without Blender to find broken files")
+    parser.add_argument("roots", nargs = "+", help = "Folders or files to parse")
+    parser.add_argument("--workers", type = int, default = None, help = "Worker processes, defaults to the CPU count")
+    parser.add_argument("--use-cache", action = "store_true", help = "Use the parse cache, cached files are not parsed again")
+    parser.add_argument("--slowest", type = int, default = 10, help = "Amount of slowest files to list")
+    parser.add_argument("--verbose", action = "store_true", help = "Print the parse time of every file")
+    parser.add_argument("--chunk-stats", action = "store_true", help = "Record calls, bytes and time per LWO chunk type")
+    args = parser.parse_args(argv)
+    
+    paths = find_assets(args.roots)
+    
+    start = time.perf_counter()
+    results = sweep(paths, args.workers, args.use_cache, args.chunk_stats)
+    seconds = time.perf_counter() - start
+    
+    print_report(results, seconds, args.verbose, args.slowest)
+    
+    return 1 if any(x.error for x in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,4 +1,14 @@
+try:
+    from . import WadLoad
+except ImportError:
+    import WadLoad
 
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 class BmpData:
     
@@ -6,27 +16,26 @@ class BmpData:
         self.width = 0
         self.height = 0
         self.colors = []
+        
+        """ Bits per pixel of the file, 4, 8 or 24 """
+        self.bits = 8
+        
+        """ Rows from bottom to top like Blender images, as a flat uint8 numpy array, or bytes without numpy.
+        Files of up to 8 bits hold one palette index per pixel. 24 bit files have no palette, colors is empty
+        and pixels holds an RGB triple per pixel instead, so only decode_rgba handles every format the same """
         self.pixels = []
 
-def get_int(raw, i, size = 4):
-    return int.from_bytes(raw[i:i+size], "little")
-
-def flatten(l):
-    nl = []
-    for sl in l:
-        for x in sl:
-            nl.append(x)
-    return nl
+def get_int(raw, i, size = 4, signed = False):
+    return int.from_bytes(raw[i:i+size], "little", signed=signed)
 
-def load_bmp(path):
+def load_bmp(source):
+    """ source can be a path, a WadEntry, a file-like or a bytes-like object """
     
     data = BmpData()
     
-    raw = None
-    with open(path, "rb+") as f:
-        raw = f.read()
+    raw = WadLoad.read_source(source)
     
-    if raw[0:2].decode("ASCII") != "BM":
+    if raw[0:2] != b"BM":
         raise Exception("Invalid magic")
     
     pixel_offset = get_int(raw, 10)
@@ -35,40 +44,169 @@ def load_bmp(path):
     if get_int(raw, 0x0E) != 40:
         raise Exception("Invalid info header")
     
-    data.width = get_int(raw, 0x12)
-    data.height = get_int(raw, 0x16)
+    data.width = get_int(raw, 0x12, signed=True)
+    # A negative height means the rows are stored from top to bottom
+    height = get_int(raw, 0x16, signed=True)
+    data.height = abs(height)
+    top_down = height < 0
+    
+    if data.width < 0:
+        raise Exception("Invalid width")
     
     # Check that we only have one color plane
     if get_int(raw, 0x1A, 2) != 1:
         raise Exception("Invalid color plane count")
     
     pix_bits = get_int(raw, 0x1C, 2)
-    # Check pixel size
-    if pix_bits != 8:
-        raise Exception("Expected pixels to be 8 bits big")
-    
-    palette_size = get_int(raw, 0x2E)
-    if palette_size == 0:
-        palette_size = 2**pix_bits
-    
-    off = 54
-    # Get color palette
-    for i in range(palette_size):
-        bytes = raw[off:off+4]
-        rgb = (bytes[2], bytes[1], bytes[0])
-        color = tuple(x / 255 for x in rgb)
-        data.colors.append(color)
-        off += 4
-    
-    off = pixel_offset
-    rows = []
-    for y in range(data.height):
-        row = []
-        for i in range(data.width):
-            row.append(int(raw[off]))
-            off += 1
-        rows.append(row)
-    
-    data.pixels = flatten(rows)
-    
-    return data
\ No newline at end of file
+    compression = get_int(raw, 0x1E)
+    # Check pixel size, only uncompressed and RLE8 files are supported
+    if pix_bits not in (4, 8, 24) or compression not in (0, 1) or (compression == 1 and pix_bits != 8):
+        raise Exception(f"Unsupported format, {pix_bits} bits per pixel with compression {compression}")
+    data.bits = pix_bits
+    
+    if pix_bits <= 8:
+        palette_size = get_int(raw, 0x2E)
+        if palette_size == 0:
+            palette_size = 2**pix_bits
+        
+        off = 54
+        # Get color palette
+        for i in range(palette_size):
+            bytes = raw[off:off+4]
+            rgb = (bytes[2], bytes[1], bytes[0])
+            color = tuple(x / 255 for x in rgb)
+            data.colors.append(color)
+            off += 4
+    
+    w = data.width
+    h = data.height
+    if compression == 1:
+        pixels = decode_rle8(raw, pixel_offset, w, h)
+        if numpy is not None:
+            rows = numpy.frombuffer(pixels, dtype=numpy.uint8).reshape(h, w)
+        else:
+            rows = [pixels[y*w:(y+1)*w] for y in range(h)]
+    else:
+        rows = read_rows(raw, pixel_offset, w, h, pix_bits)
+    
+    if top_down:
+        rows = rows[::-1]
+    
+    if numpy is not None:
+        # Copy, so the data does not keep a mapped WAD archive alive
+        data.pixels = numpy.array(rows).reshape(-1)
+    else:
+        data.pixels = b"".join(rows)
+    
+    return data
+
+def read_rows(raw, offset, width, height, bits):
+    """ Returns the rows in file order without padding, with one palette index or RGB triple per pixel.
+    A uint8 numpy array of shape (height, n), or a list of bytes without numpy """
+    
+    # Rows are padded to a multiple of 4 bytes
+    stride = (width * bits + 31) // 32 * 4
+    used = (width * bits + 7) // 8
+    if offset + stride * height > len(raw):
+        raise Exception("Pixel data is truncated")
+    
+    if numpy is not None:
+        rows = numpy.frombuffer(raw, dtype=numpy.uint8, count=stride * height, offset=offset)
+        rows = rows.reshape(height, stride)[:, :used]
+        if bits == 4:
+            # The high nibble is the left pixel
+            rows = numpy.stack((rows >> 4, rows & 15), axis=2).reshape(height, -1)[:, :width]
+        elif bits == 24:
+            rows = rows.reshape(height, width, 3)[:, :, ::-1].reshape(height, -1)
+        return rows
+    
+    rows = [bytes(raw[offset + y*stride:offset + y*stride + used]) for y in range(height)]
+    if bits == 4:
+        rows = [bytes(x for b in row for x in (b >> 4, b & 15))[:width] for row in rows]
+    elif bits == 24:
+        swapped = []
+        for row in rows:
+            row = bytearray(row)
+            row[0::3], row[2::3] = row[2::3], row[0::3]
+            swapped.append(bytes(row))
+        rows = swapped
+    return rows
+
+def decode_rle8(raw, offset, width, height):
+    """ Expands RLE8 pixel data to rows of palette indices without padding, in file order.
+    Runs are written as whole slices, pixels that are skipped stay at index 0 """
+    out = bytearray(width * height)
+    x = 0
+    y = 0
+    i = offset
+    end = len(raw)
+    while i + 1 < end and y < height:
+        count = raw[i]
+        value = raw[i+1]
+        i += 2
+        
+        if count > 0:
+            """ Encoded run, count times the same index """
+            n = min(count, width - x)
+            if n > 0:
+                start = y * width + x
+                out[start:start+n] = value.to_bytes(1, "little") * n
+            x += count
+        elif value == 0:
+            """ End of line """
+            x = 0
+            y += 1
+        elif value == 1:
+            """ End of bitmap """
+            break
+        elif value == 2:
+            """ Delta, move right and up """
+            if i + 1 >= end:
+                break
+            x += raw[i]
+            y += raw[i+1]
+            i += 2
+        else:
+            """ Absolute run of value indices, padded to 2 bytes """
+            n = min(value, width - x)
+            if n > 0:
+                chunk = raw[i:i+n]
+                start = y * width + x
+                out[start:start+len(chunk)] = chunk
+            x += value
+            i += value + (value & 1)
+    
+    return out
+
+def decode_rgba(data, alpha_index = None):
+    """ Returns the pixels as flat RGBA floats, rows from bottom to top.
+    Pixels using the palette entry alpha_index are fully transparent, like in the A###_ textures.
+    24 bit files have no palette and are always opaque.
+    A float32 numpy array, or array("f") without numpy """
+    
+    if data.bits == 24:
+        if numpy is not None:
+            rgba = numpy.ones((len(data.pixels) // 3, 4), dtype=numpy.float32)
+            rgba[:, 0:3] = numpy.asarray(data.pixels, dtype=numpy.uint8).reshape(-1, 3) * numpy.float32(1 / 255)
+            return rgba.reshape(-1)
+        
+        rgba = array("f")
+        pixels = data.pixels
+        for i in range(0, len(pixels), 3):
+            rgba.extend((pixels[i] / 255, pixels[i+1] / 255, pixels[i+2] / 255, 1.0))
+        return rgba
+    
+    # Indices past the palette are black, same as most viewers show them
+    lut = [(r, g, b, 1.0) for r, g, b in data.colors]
+    lut += [(0.0, 0.0, 0.0, 1.0)] * (256 - len(lut))
+    if alpha_index is not None and 0 <= alpha_index < 256:
+        lut[alpha_index] = lut[alpha_index][0:3] + (0.0,)
+    
+    if numpy is not None:
+        lut = numpy.array(lut, dtype=numpy.float32)
+        return lut[numpy.asarray(data.pixels, dtype=numpy.uint8)].reshape(-1)
+    
+    rgba = array("f")
+    for x in data.pixels:
+        rgba.extend(lut[x])
+    return rgba
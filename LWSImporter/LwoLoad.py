@@ -1,5 +1,35 @@
 
+import os
+import re
+import sys
+import mmap
+import time
+import struct
+from array import array
+
+try:
+    from . import WadLoad
+    from . import ParseCache
+except ImportError:
+    import WadLoad
+    import ParseCache
+
+""" Bump whenever the parsed data changes, so cached results of older versions are not used """
+PARSER_VERSION = 2
+
+""" NumPy is optional, the pure Python paths are used if it is missing """
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def new_int_array(values = ()):
+    if numpy is not None:
+        return numpy.array(values, dtype=numpy.int32)
+    return array("i", values)
+
 class LwoTexture:
+    __slots__ = ("filepath", "sequenced", "interpolate", "projAxis", "size", "center")
     
     def __init__(self):
         self.filepath = None
@@ -12,6 +42,7 @@ class LwoTexture:
         self.center = (0, 0, 0)
 
 class LwoSurface:
+    __slots__ = ("name", "doubleSided", "additive", "color", "ctex", "lastTex")
     
     def __init__(self):
         self.name = ""
@@ -32,38 +63,111 @@ class LwoSurface:
         """ Only consider color maps """
         self.color = (1, 1, 1)
         self.ctex = None
-        self.__lastTex = None
         
+        """ Texture the texture subchunks apply to """
+        self.lastTex = None
 
 class LwoData:
+    __slots__ = ("surfNames", "surfs", "verts", "polVerts", "polStart", "polVertCount", "polSurfId")
     
     def __init__(self):
         self.surfNames = []
         self.surfs = {}
         self.verts = []
-        self.polVerts = []
-        self.polVertCount = []
-        self.polSurfId = []
+        
+        """ Polygons in compressed sparse row layout. The vertex indices of polygon p are
+        polVerts[polStart[p]:polStart[p] + polVertCount[p]] and its surface is polSurfId[p] (1 based).
+        These are int32 NumPy arrays if NumPy is available, otherwise array.array("i") """
+        self.polVerts = new_int_array()
+        self.polStart = new_int_array()
+        self.polVertCount = new_int_array()
+        self.polSurfId = new_int_array()
+
+""" Indices of the coordinates used as x and y for each projection axis """
+projection_axes = {
+    "X": (2, 1),
+    "Y": (0, 2),
+    "Z": (0, 1)
+    }
 
 def planar_project(tex, vec):
     
-    xoff = 0
-    yoff = 0
-    if tex.projAxis == "X":
-        xoff = 2
-        yoff = 1
-    elif tex.projAxis == "Y":
-        xoff = 0
-        yoff = 2
-    else:
-        xoff = 0
-        yoff = 1
+    xoff, yoff = projection_axes.get(tex.projAxis, (0, 1))
     
     x = 0.5 + ((vec[xoff] - tex.center[xoff]) / tex.size[xoff])
     y = 0.5 + ((vec[yoff] - tex.center[yoff]) / tex.size[yoff])
     
     return (x, y)
 
+def planar_project_array(tex, verts):
+    """ Projects all given vertex positions in one go.
+    Returns an (n, 2) float32 array if NumPy is available, otherwise a list of tuples """
+    if numpy is None:
+        return [planar_project(tex, vec) for vec in verts]
+    
+    xoff, yoff = projection_axes.get(tex.projAxis, (0, 1))
+    verts = numpy.asarray(verts, dtype=numpy.float32).reshape(-1, 3)
+    
+    uvs = numpy.empty((len(verts), 2), dtype=numpy.float32)
+    uvs[:, 0] = 0.5 + (verts[:, xoff] - tex.center[xoff]) / tex.size[xoff]
+    uvs[:, 1] = 0.5 + (verts[:, yoff] - tex.center[yoff]) / tex.size[yoff]
+    return uvs
+
+def group_loops_by_surface(data):
+    """ Groups the loops, which are indices into polVerts, by the surface id of their polygon in a single pass.
+    Returns a dict from surface id to the loop indices in ascending order """
+    if numpy is not None:
+        loopSurfIds = numpy.repeat(numpy.asarray(data.polSurfId), numpy.asarray(data.polVertCount))
+        order = numpy.argsort(loopSurfIds, kind="stable")
+        ids, starts = numpy.unique(loopSurfIds[order], return_index=True)
+        return dict(zip(ids.tolist(), numpy.split(order, starts[1:])))
+    
+    groups = {}
+    for p in range(len(data.polSurfId)):
+        start = data.polStart[p]
+        groups.setdefault(data.polSurfId[p], []).extend(range(start, start + data.polVertCount[p]))
+    return groups
+
+def project_surface(data, tex, loops):
+    """ Planar projected UVs of the given loops, see group_loops_by_surface """
+    if numpy is not None:
+        verts = numpy.asarray(data.verts, dtype=numpy.float32).reshape(-1, 3)
+        return planar_project_array(tex, verts[numpy.asarray(data.polVerts)[loops]])
+    return planar_project_array(tex, [data.verts[data.polVerts[x]] for x in loops])
+
+def loop_uvs(data, uvs = None):
+    """ Returns the UVs of all loops as flat (u, v) pairs in polygon order, ready to be written in one go.
+    Starts from uvs, like UvData.uvs, or from zeros. Surfaces with a color texture are planar projected instead.
+    A float32 numpy array, or array("f") without numpy """
+    count = len(data.polVerts)
+    groups = group_loops_by_surface(data)
+    
+    if numpy is not None:
+        if uvs is None:
+            out = numpy.zeros((count, 2), dtype=numpy.float32)
+        else:
+            out = numpy.array(uvs, dtype=numpy.float32).reshape(count, 2)
+    else:
+        out = array("f", uvs) if uvs is not None else array("f", bytes(count * 2 * 4))
+    
+    for i, name in enumerate(data.surfNames):
+        surf = data.surfs[name]
+        loops = groups.get(i + 1)
+        if not surf.ctex or loops is None:
+            continue
+        
+        projected = project_surface(data, surf.ctex, loops)
+        if numpy is not None:
+            out[loops] = projected
+        else:
+            for loop, uv in zip(loops, projected):
+                out[loop * 2] = uv[0]
+                out[loop * 2 + 1] = uv[1]
+    
+    if numpy is not None:
+        return out.reshape(-1)
+    return out
+
 
 
 
@@ -71,28 +175,85 @@ def planar_project(tex, vec):
 chunk_parsers = {}
 subchunk_parsers = {}
 
-def parse_chunk(data, raw, i):
+class ParseStats:
+    """ Calls, bytes and cumulative seconds per chunk and subchunk name.
+    The time of a chunk includes the time of its subchunks """
+    
+    def __init__(self):
+        self.chunks = {}
+        self.subchunks = {}
+    
+    def record(self, table, name, size, seconds):
+        entry = table.setdefault(name, [0, 0, 0.0])
+        entry[0] += 1
+        entry[1] += size
+        entry[2] += seconds
+    
+    def merge(self, other):
+        """ Adds the numbers of another ParseStats, for example one recorded in a worker process """
+        for table, others in ((self.chunks, other.chunks), (self.subchunks, other.subchunks)):
+            for name, values in others.items():
+                entry = table.setdefault(name, [0, 0, 0.0])
+                for k in range(3):
+                    entry[k] += values[k]
+    
+    def report(self):
+        lines = []
+        for title, table in (("Chunks", self.chunks), ("Subchunks", self.subchunks)):
+            lines.append(f"{title}:")
+            for name, (calls, size, seconds) in sorted(table.items(), key = lambda x: x[1][2], reverse = True):
+                lines.append(f"  {name}  {calls:8} calls {size:12} bytes {seconds * 1000:12.3f} ms")
+        return "\n".join(lines)
+
+""" Instrumentation of the chunk dispatch, None when disabled """
+stats = None
+
+def enable_stats():
+    """ Starts recording into a new ParseStats, which is returned """
+    global stats
+    stats = ParseStats()
+    return stats
+
+def disable_stats():
+    """ Stops recording and returns the recorded ParseStats """
+    global stats
+    result = stats
+    stats = None
+    return result
+
+""" All parsers work on one memoryview over the whole file and unpack at offsets, so no bytes are copied """
+def read_chunk_header(raw, i):
     if (len(raw) - i) < 8:
         raise Exception("Chunk header too short")
-    name = raw[i:i+4].decode("ASCII")
-    size = int.from_bytes(raw[i+4:i+8], "big")
-    
+    name, size = struct.unpack_from(">4sI", raw, i)
+    return name.decode("ASCII"), size
+
+def dispatch_chunk(data, raw, name, i, size):
     parser = None
     try:
         parser = chunk_parsers[name]
     except:
         print(f"No parser for chunk \"{name}\" known.")
     
-    if parser:
-        parser(data, raw, i+8, size)
+    if stats is not None:
+        start = time.perf_counter()
+        if parser:
+            parser(data, raw, i, size)
+        stats.record(stats.chunks, name, size, time.perf_counter() - start)
+    elif parser:
+        parser(data, raw, i, size)
+
+def parse_chunk(data, raw, i):
+    name, size = read_chunk_header(raw, i)
+    dispatch_chunk(data, raw, name, i+8, size)
     
     return 8 + size
 
 def parse_subchunk(data, raw, i):
     if (len(raw) - i) < 6:
         raise Exception("Subchunk header too short")
-    name = raw[i:i+4].decode("ASCII")
-    size = int.from_bytes(raw[i+4:i+6], "big")
+    name, size = struct.unpack_from(">4sH", raw, i)
+    name = name.decode("ASCII")
     
     parser = None
     try:
@@ -100,25 +261,110 @@ def parse_subchunk(data, raw, i):
     except:
         print(f"No parser for subchunk \"{name}\" known.")
     
-    if parser:
+    if stats is not None:
+        start = time.perf_counter()
+        if parser:
+            parser(data, raw, i+6, size)
+        stats.record(stats.subchunks, name, size, time.perf_counter() - start)
+    elif parser:
         parser(data, raw, i+6, size)
     
     return 6 + size
 
-def load_lwo(filepath):
-    
-    data = LwoData()
-    
-    raw = None
-    with open(filepath, "rb+") as f:
-        raw = f.read()
-    
+def check_header(raw):
     if len(raw) < 12:
         raise Exception("File is too short")
-    if raw[0:4].decode("ASCII") != "FORM":
+    if raw[0:4] != b"FORM":
         raise Exception("File does not start with FORM")
-    if raw[8:12].decode("ASCII") != "LWOB":
+    if raw[8:12] != b"LWOB":
         raise Exception("File is not an LWO B file")
+
+def scan_chunks(raw):
+    """ Returns (name, offset, size) of every chunk without parsing them. offset points past the header """
+    check_header(raw)
+    
+    chunks = []
+    offset = 12
+    while offset < len(raw):
+        name, size = read_chunk_header(raw, offset)
+        chunks.append((name, offset + 8, size))
+        offset += 8 + size
+    
+    return chunks
+
+def load_lwo(source):
+    """ source can be a path, a WadEntry, a file-like or a bytes-like object """
+    
+    raw = WadLoad.read_source(source)
+    
+    data = ParseCache.fetch(__name__, PARSER_VERSION, raw, decode_cached)
+    if data is None:
+        data = parse_lwo(raw)
+        ParseCache.store(__name__, PARSER_VERSION, raw, data, encode_cached)
+    
+    return data
+
+""" Arrays of LwoData written to the parse cache, by typecode """
+cached_arrays = {"polVerts": "i", "polStart": "i", "polVertCount": "i", "polSurfId": "i"}
+
+def encode_cached(data):
+    """ Returns the fields and arrays of LwoData for ParseCache """
+    surfs = []
+    for surf in data.surfs.values():
+        ctex = surf.ctex
+        if ctex:
+            ctex = {"filepath": ctex.filepath, "sequenced": ctex.sequenced, "interpolate": ctex.interpolate,
+                    "projAxis": ctex.projAxis, "size": list(ctex.size), "center": list(ctex.center)}
+        surfs.append({"name": surf.name, "doubleSided": surf.doubleSided, "additive": surf.additive,
+                      "color": list(surf.color), "ctex": ctex})
+    
+    arrays = {x: getattr(data, x) for x in cached_arrays}
+    if numpy is not None:
+        arrays["verts"] = numpy.asarray(data.verts, dtype=numpy.float32).reshape(-1)
+    else:
+        arrays["verts"] = array("f", [x for vec in data.verts for x in vec])
+    
+    return {"surfNames": data.surfNames, "surfs": surfs}, arrays
+
+def decode_cached(fields, arrays):
+    data = LwoData()
+    data.surfNames = fields["surfNames"]
+    for x in fields["surfs"]:
+        surf = LwoSurface()
+        surf.name = x["name"]
+        surf.doubleSided = x["doubleSided"]
+        surf.additive = x["additive"]
+        surf.color = tuple(x["color"])
+        if x["ctex"]:
+            ctex = x["ctex"]
+            surf.ctex = LwoTexture()
+            surf.ctex.filepath = ctex["filepath"]
+            surf.ctex.sequenced = ctex["sequenced"]
+            surf.ctex.interpolate = ctex["interpolate"]
+            surf.ctex.projAxis = ctex["projAxis"]
+            surf.ctex.size = tuple(ctex["size"])
+            surf.ctex.center = tuple(ctex["center"])
+        data.surfs[surf.name] = surf
+    
+    for name, typecode in cached_arrays.items():
+        if arrays[name].typecode != typecode:
+            raise ValueError(f"Cached {name} has the wrong type")
+        setattr(data, name, numpy.frombuffer(arrays[name], dtype=numpy.int32) if numpy is not None else arrays[name])
+    
+    verts = arrays["verts"]
+    if numpy is not None:
+        data.verts = numpy.frombuffer(verts, dtype=numpy.float32).reshape(-1, 3)
+    else:
+        data.verts = list(zip(verts[0::3], verts[1::3], verts[2::3]))
+    
+    return data
+
+def parse_lwo(raw):
+    
+    data = LwoData()
+    
+    raw = memoryview(raw)
+    check_header(raw)
     
     offset = 12
     while offset < len(raw):
@@ -126,35 +372,187 @@ def load_lwo(filepath):
     
     return data
 
+class LwoFile:
+    """ Lazily parsed LWO file.
+    The file is memory mapped read only and only the chunk headers are scanned when opening it.
+    Each chunk is parsed the first time an attribute that depends on it is accessed,
+    the attributes are the same as the ones of LwoData. """
+    
+    """ Chunks needed by each LwoData attribute """
+    attribute_chunks = {
+        "surfNames": ("SRFS",),
+        "surfs": ("SURF",),
+        "verts": ("PNTS",),
+        "polVerts": ("POLS",),
+        "polStart": ("POLS",),
+        "polVertCount": ("POLS",),
+        "polSurfId": ("POLS",)
+        }
+    
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.map = None
+        self.raw = None
+        with open(filepath, "rb") as f:
+            if os.fstat(f.fileno()).st_size < 12:
+                raise Exception("File is too short")
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.raw = memoryview(self.map)
+        
+        try:
+            self.chunks = scan_chunks(self.raw)
+        except:
+            self.close()
+            raise
+        self.parsed = set()
+        self.data = LwoData()
+    
+    def parse(self, *names):
+        """ Parses all chunks with the given names that have not been parsed yet """
+        for index in range(len(self.chunks)):
+            name, offset, size = self.chunks[index]
+            if name in names and index not in self.parsed:
+                self.parsed.add(index)
+                dispatch_chunk(self.data, self.raw, name, offset, size)
+    
+    def load(self):
+        """ Parses every remaining chunk and returns the complete LwoData """
+        self.parse(*set(x[0] for x in self.chunks))
+        return self.data
+    
+    def texture_paths(self):
+        """ Returns the image paths used by the surfaces. Only touches the SRFS and SURF chunks """
+        paths = []
+        for name in self.surfNames:
+            surf = self.surfs.get(name)
+            if surf and surf.ctex and surf.ctex.filepath:
+                paths.append(surf.ctex.filepath)
+        return paths
+    
+    def __getattr__(self, name):
+        chunks = LwoFile.attribute_chunks.get(name)
+        if chunks is None:
+            raise AttributeError(name)
+        self.parse(*chunks)
+        return getattr(self.data, name)
+    
+    def close(self):
+        """ The view has to be released before the map can be closed """
+        if self.raw is not None:
+            self.raw.release()
+            self.raw = None
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+
+def open_lwo(filepath):
+    return LwoFile(filepath)
+
 
 """ Parser functions """
+null_pattern = re.compile(b"\0")
+
+def parse_string(raw, i, size):
+    """ Returns the null terminated string at i and its length without the terminator """
+    match = null_pattern.search(raw, i, i + size)
+    if not match:
+        raise Exception("Missing null termination")
+    length = match.start() - i
+    return str(raw[i:i+length], "ASCII"), length
+
+def padded_length(length):
+    """ Length of a string including its terminator, padded to an even size """
+    return length + 2 - (length % 2)
+
 def parse_vec(raw, i, dimension):
-    import struct
-    return tuple(struct.unpack(">f", raw[i+x*4:i+(x+1)*4])[0] for x in range(dimension))
+    return struct.unpack_from(f">{dimension}f", raw, i)
+
+def parse_vec_array(raw, i, count, dimension):
+    """ Decodes count big endian float vectors in one go.
+    Returns a (count, dimension) float32 array if NumPy is available, otherwise a list of tuples """
+    if numpy is not None:
+        floats = numpy.frombuffer(raw, ">f4", count * dimension, i)
+        return floats.astype(numpy.float32).reshape(count, dimension)
+    
+    floats = struct.unpack_from(f">{count * dimension}f", raw, i)
+    return list(zip(*(floats[x::dimension] for x in range(dimension))))
 
 
 
 def parse_PNTS(data, raw, i, size):
-    vecs = size // 12
-    data.verts = [parse_vec(raw, i + x*12, 3) for x in range(vecs)]
+    data.verts = parse_vec_array(raw, i, size // 12, 3)
 
 chunk_parsers["PNTS"] = parse_PNTS
 
 
 
+def parse_short_array(raw, i, count):
+    shorts = array("H")
+    shorts.frombytes(raw[i:i + count*2])
+    if shorts.itemsize != 2:
+        raise Exception("Platform has no 16 bit unsigned array type")
+    if sys.byteorder == "little":
+        shorts.byteswap()
+    return shorts
+
 def parse_POLS(data, raw, i, size):
-    shorts = [int.from_bytes(raw[i+x*2:i+(x+1)*2], "big") for x in range(size // 2)]
+    shorts = parse_short_array(raw, i, size // 2)
+    
+    """ Walk the polygon headers only, vertex indices are gathered in bulk afterwards """
+    starts = []
+    counts = []
+    surfIds = []
     
     j = 0
-    while j < len(shorts):
+    end = len(shorts)
+    while j < end:
         vertCount = shorts[j]
-        data.polVertCount.append(vertCount)
-        j += 1
-        for x in range(vertCount):
-            data.polVerts.append(shorts[j+x])
-        j += vertCount
-        data.polSurfId.append(shorts[j])
+        starts.append(j + 1)
+        counts.append(vertCount)
+        j += vertCount + 1
+        if j >= end:
+            raise Exception("Polygon is missing its surface")
+        
+        surfId = shorts[j]
+        if surfId >= 0x8000:
+            """ Negative surface, the next short is the count of the detail polygons that follow """
+            surfId = 0x10000 - surfId
+            j += 1
+        surfIds.append(surfId)
         j += 1
+    
+    polStart = [0] * len(counts)
+    total = 0
+    for p in range(len(counts)):
+        polStart[p] = total
+        total += counts[p]
+    
+    """ Offset by already parsed polygons, in case there is more than one POLS chunk """
+    base = len(data.polVerts)
+    
+    if numpy is not None:
+        source = numpy.frombuffer(shorts, numpy.uint16)
+        counts = numpy.array(counts, dtype=numpy.int32)
+        polStart = numpy.array(polStart, dtype=numpy.int32)
+        gather = numpy.repeat(numpy.array(starts, dtype=numpy.int64) - polStart, counts) + numpy.arange(total)
+        
+        data.polVerts = numpy.concatenate((data.polVerts, source[gather].astype(numpy.int32)))
+        data.polStart = numpy.concatenate((data.polStart, polStart + base))
+        data.polVertCount = numpy.concatenate((data.polVertCount, counts))
+        data.polSurfId = numpy.concatenate((data.polSurfId, new_int_array(surfIds)))
+    else:
+        source = array("i", shorts)
+        for p in range(len(starts)):
+            data.polVerts.extend(source[starts[p]:starts[p] + counts[p]])
+        data.polStart.extend(x + base for x in polStart)
+        data.polVertCount.extend(counts)
+        data.polSurfId.extend(surfIds)
 
 chunk_parsers["POLS"] = parse_POLS
 
@@ -163,24 +561,13 @@ def parse_SRFS(data, raw, i, size):
     
     j = 0
     while j < size:
-        lname = 0
-        k = i + j
-        rem = size - j
-        while raw[k+lname] != 0 and lname < rem:
-            lname += 1
-        if lname >= rem:
-            raise Exception("Missing null termination")
-        elif lname == 0:
+        name, lname = parse_string(raw, i + j, size - j)
+        if lname == 0:
             raise Exception("Misformed string")
         
-        name = raw[k:k+lname].decode("ASCII")
         data.surfNames.append(name)
-        
-        if lname % 2 == 0:
-            j += lname + 2
-        else:
-            j += lname + 1
-        
+        j += padded_length(lname)
+
 chunk_parsers["SRFS"] = parse_SRFS
 
 
@@ -189,20 +576,10 @@ def parse_SURF(data, raw, i, size):
     
     surf = LwoSurface()
     """ Parse name """
-    lname = 0
-    while raw[i+lname] != 0 and lname < size:
-        lname += 1
-    if lname >= size:
-        raise Exception("Missing null termination")
-    
-    surf.name = raw[i:i+lname].decode("ASCII")
+    surf.name, lname = parse_string(raw, i, size)
     
     """ Continue and ensure alignment """
-    j = 0
-    if lname % 2 == 0:
-        j += lname + 2
-    else:
-        j += lname + 1
+    j = padded_length(lname)
     
     """ Parse subchunks """
     while j < size:
@@ -237,72 +614,54 @@ subchunk_parsers["FLAG"] = parse_FLAG
 
 def parse_CTEX(surf, raw, i, size):
     """ Parse type string """
-    ltype = 0
-    while raw[i+ltype] != 0 and ltype < size:
-        ltype += 1
-    if ltype >= size:
-        raise Exception("Missing null termination")
-    
-    type = raw[i:i+ltype].decode("ASCII")
+    type, ltype = parse_string(raw, i, size)
     
     if type != "Planar Image Map":
         raise Exception("Unknown texture mapping type")
     
     surf.ctex = LwoTexture()
-    surf.__lastTex = surf.ctex
+    surf.lastTex = surf.ctex
 
 subchunk_parsers["CTEX"] = parse_CTEX
 
 
 
 def parse_DTEX(surf, raw, i, size):
-    surf.__lastTex = LwoTexture()
-subchunk_parsers["DTEX"] = parse_DTEX
-
-
-
-def parse_DTEX(surf, raw, i, size):
-    surf.__lastTex = LwoTexture()
+    surf.lastTex = LwoTexture()
 subchunk_parsers["DTEX"] = parse_DTEX
 
 
 def parse_STEX(surf, raw, i, size):
-    surf.__lastTex = LwoTexture()
+    surf.lastTex = LwoTexture()
 subchunk_parsers["STEX"] = parse_STEX
 
 
 def parse_RTEX(surf, raw, i, size):
-    surf.__lastTex = LwoTexture()
+    surf.lastTex = LwoTexture()
 subchunk_parsers["RTEX"] = parse_RTEX
 
 
 def parse_TTEX(surf, raw, i, size):
-    surf.__lastTex = LwoTexture()
+    surf.lastTex = LwoTexture()
 subchunk_parsers["TTEX"] = parse_TTEX
 
 
 def parse_BTEX(surf, raw, i, size):
-    surf.__lastTex = LwoTexture()
+    surf.lastTex = LwoTexture()
 subchunk_parsers["BTEX"] = parse_BTEX
 
 
 
 def parse_TIMG(surf, raw, i, size):
-    if not surf.__lastTex:
+    if not surf.lastTex:
         raise Exception("Missing TEX subchunk before this subchunk.")
-    tex = surf.__lastTex
+    tex = surf.lastTex
     
     """ Parse filepath """
-    lpath = 0
-    while raw[i+lpath] != 0 and lpath < size:
-        lpath += 1
-    if lpath >= size:
-        raise Exception("Missing null termination")
-    
-    filename = raw[i:i+lpath].decode("ASCII")
+    filename, lpath = parse_string(raw, i, size)
     if filename.endswith(" (sequence)"):
         tex.filepath = filename[:-len(" (sequence)")]
-        tex.sequcned = True
+        tex.sequenced = True
     else:
         tex.filepath = filename
         tex.sequenced = False
@@ -312,9 +671,9 @@ subchunk_parsers["TIMG"] = parse_TIMG
 
 
 def parse_TFLG(surf, raw, i, size):
-    if not surf.__lastTex:
+    if not surf.lastTex:
         raise Exception("Missing TEX subchunk before this subchunk.")
-    tex = surf.__lastTex
+    tex = surf.lastTex
     
     if size != 2:
         raise Exception("TFLG has the wrong length")
@@ -335,9 +694,9 @@ subchunk_parsers["TFLG"] = parse_TFLG
 
 
 def parse_TSIZ(surf, raw, i, size):
-    if not surf.__lastTex:
+    if not surf.lastTex:
         raise Exception("Missing TEX subchunk before this subchunk.")
-    tex = surf.__lastTex
+    tex = surf.lastTex
     
     if size != 12:
         raise Exception("TSIZ has the wrong length")
@@ -349,9 +708,9 @@ subchunk_parsers["TSIZ"] = parse_TSIZ
 
 
 def parse_TCTR(surf, raw, i, size):
-    if not surf.__lastTex:
+    if not surf.lastTex:
         raise Exception("Missing TEX subchunk before this subchunk.")
-    tex = surf.__lastTex
+    tex = surf.lastTex
     
     if size != 12:
         raise Exception("TCTR has the wrong length")
@@ -1,9 +1,81 @@
+try:
+	from . import WadLoad
+	from . import ParseCache
+except ImportError:
+	import WadLoad
+	import ParseCache
+
+""" Bump whenever the parsed data changes, so cached results of older versions are not used """
+PARSER_VERSION = 3
+
+from array import array
+
+class LwsKeyframes:
+	""" Keyframes stored in two flat arrays, width values per frame.
+	Behaves like a read only dict from frame to value. The value is a float for a width of 1,
+	otherwise a tuple of 3-tuples, so (position, rotation, scale) for transform keyframes """
+	__slots__ = ("width", "frames", "data")
+	
+	def __init__(self, width):
+		self.width = width
+		self.frames = array("i")
+		self.data = array("d")
+	
+	def set(self, frame, values):
+		w = self.width
+		frames = self.frames
+		if len(frames) > 0 and frame <= frames[-1] and frame in frames:
+			""" Same as a dict, the last keyframe of a frame wins """
+			i = frames.index(frame)
+			self.data[i*w:(i+1)*w] = array("d", values)
+		else:
+			frames.append(frame)
+			self.data.extend(values)
+	
+	def value(self, i):
+		w = self.width
+		if w == 1:
+			return self.data[i]
+		d = self.data
+		return tuple(tuple(d[i*w+k:i*w+k+3]) for k in range(0, w, 3))
+	
+	def __getitem__(self, frame):
+		try:
+			return self.value(self.frames.index(frame))
+		except ValueError:
+			raise KeyError(frame)
+	
+	def __contains__(self, frame):
+		return frame in self.frames
+	
+	def __iter__(self):
+		return iter(self.frames)
+	
+	def __len__(self):
+		return len(self.frames)
+	
+	def keys(self):
+		return list(self.frames)
+	
+	def values(self):
+		return [self.value(i) for i in range(len(self.frames))]
+	
+	def items(self):
+		return [(self.frames[i], self.value(i)) for i in range(len(self.frames))]
+	
+	def __eq__(self, other):
+		return dict(self.items()) == dict(other.items())
+	
+	def __repr__(self):
+		return repr(dict(self.items()))
 
 class LwsObject:
+	__slots__ = ("keyframes", "alphaKeyframes", "name", "filepath", "parent", "pivot")
 	
 	def __init__(self):
-		self.keyframes = {}
-		self.alphaKeyframes = {}
+		""" Position, rotation and scale per frame """
+		self.keyframes = LwsKeyframes(9)
+		self.alphaKeyframes = LwsKeyframes(1)
 		
 		self.name = None
 		self.filepath = None
@@ -11,6 +83,7 @@ class LwsObject:
 		self.pivot = (0, 0, 0)
 
 class LwsAnimation:
+	__slots__ = ("firstFrame", "lastFrame", "framesPerSecond", "objects")
 	
 	def __init__(self):
 		self.firstFrame = 0
@@ -22,7 +95,7 @@ class LwsAnimation:
 import math
 def parse_keyframes(lines, i):
 	oldi = i
-	frames = {}
+	frames = LwsKeyframes(9)
 	entries = int(lines[i+2])
 	i += 3
 	
@@ -38,7 +111,8 @@ def parse_keyframes(lines, i):
 			raise Exception("Too few floats for keyframe.")
 		
 		""" Position, Rotation, Scale """
-		frames[frame] = (tuple(floats[0:3]), tuple([(x*math.pi / 180.0) for x in floats[3:6]]), tuple(floats[6:9]))
+		floats[3:6] = [(x*math.pi / 180.0) for x in floats[3:6]]
+		frames.set(frame, floats)
 		
 		i += 2
 	
@@ -51,7 +125,7 @@ def parse_keyframes(lines, i):
 
 def parse_alpha_keyframes(lines, i):
 	oldi = i
-	frames = {}
+	frames = LwsKeyframes(1)
 	entries = int(lines[i+2])
 	i += 3
 	
@@ -64,7 +138,7 @@ def parse_alpha_keyframes(lines, i):
 		frame = int(lineB.strip().split(" ")[0])
 		value = float(lineA.strip())
 		
-		frames[frame] = value
+		frames.set(frame, (value,))
 		
 		i += 2
 	
@@ -74,11 +148,61 @@ def parse_alpha_keyframes(lines, i):
 	
 	raise Exception("Unexpected end of alpha keyframes.")
 
-def load_lws(filepath):
+def load_lws(source):
+	""" source can be a path, a WadEntry, a file-like or a bytes-like object """
+	
+	raw = WadLoad.read_source(source)
+	
+	anim = ParseCache.fetch(__name__, PARSER_VERSION, raw, decode_cached)
+	if anim is None:
+		anim = parse_lws(raw)
+		ParseCache.store(__name__, PARSER_VERSION, raw, anim, encode_cached)
+	
+	return anim
+
+def encode_cached(anim):
+	""" Returns the fields and arrays of LwsAnimation for ParseCache, the keyframes of object i are named "i.frames" and so on """
+	objects = []
+	arrays = {}
+	for i, x in enumerate(anim.objects):
+		objects.append({"name": x.name, "filepath": x.filepath, "parent": x.parent, "pivot": list(x.pivot)})
+		arrays[f"{i}.frames"] = x.keyframes.frames
+		arrays[f"{i}.data"] = x.keyframes.data
+		arrays[f"{i}.alphaFrames"] = x.alphaKeyframes.frames
+		arrays[f"{i}.alphaData"] = x.alphaKeyframes.data
+	
+	fields = {"firstFrame": anim.firstFrame, "lastFrame": anim.lastFrame, "framesPerSecond": anim.framesPerSecond, "objects": objects}
+	return fields, arrays
+
+def decode_cached(fields, arrays):
+	anim = LwsAnimation()
+	anim.firstFrame = fields["firstFrame"]
+	anim.lastFrame = fields["lastFrame"]
+	anim.framesPerSecond = fields["framesPerSecond"]
+	
+	for i, x in enumerate(fields["objects"]):
+		obj = LwsObject()
+		obj.name = x["name"]
+		obj.filepath = x["filepath"]
+		obj.parent = x["parent"]
+		obj.pivot = tuple(x["pivot"])
+		
+		for keyframes, framesName, dataName in ((obj.keyframes, "frames", "data"), (obj.alphaKeyframes, "alphaFrames", "alphaData")):
+			frames = arrays[f"{i}.{framesName}"]
+			data = arrays[f"{i}.{dataName}"]
+			if frames.typecode != "i" or data.typecode != "d" or len(data) != len(frames) * keyframes.width:
+				raise ValueError("Cached keyframes do not match")
+			keyframes.frames = frames
+			keyframes.data = data
+		
+		anim.objects.append(obj)
+	
+	return anim
+
+def parse_lws(raw):
 	
-	lines = None
-	with open(filepath, "r") as f:
-		lines = [x.rstrip("\r\n") for x in f.readlines()]
+	# Only split on line endings, splitlines would also split paths at characters like \x85
+	lines = [x.rstrip("\r") for x in str(raw, "latin-1").split("\n")]
 	lines = [x for x in lines if x != ""]
 	
 	""" Check magic """
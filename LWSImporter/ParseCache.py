@@ -0,0 +1,194 @@
+import os
+import sys
+import json
+import struct
+import hashlib
+from array import array
+
+""" Persistent cache of parsed files.
+Entries are keyed by a hash of the file contents, the parser kind and the parser version,
+so edited files always miss and parser changes never pick up stale data.
+The least recently used entries are removed once the cache grows past max_size.
+
+Each loader converts its data to plain fields and flat arrays. An entry is "LRRC", the uint32 length
+of a JSON header holding the fields and the typecode and length of each array, followed by the raw
+array contents. Nothing in an entry is executed when it is read, so the cache can live on shared folders. """
+
+MAGIC = b"LRRC"
+
+def default_cache_dir():
+    """ LRR_PARSE_CACHE overrides the location, setting it to an empty string disables the cache """
+    path = os.environ.get("LRR_PARSE_CACHE")
+    if path is not None:
+        return path or None
+    
+    base = None
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME")
+    if not base:
+        base = os.path.join(os.path.expanduser("~"), ".cache")
+    
+    return os.path.join(base, "LRRBlender", "parse")
+
+""" Directory of the cache, None disables caching """
+cache_dir = default_cache_dir()
+max_size = 256 * 1024 * 1024
+
+""" Size of all entries, computed on the first store """
+current_size = None
+
+def configure(directory, size = None):
+    global cache_dir, max_size, current_size
+    cache_dir = directory
+    if size is not None:
+        max_size = size
+    current_size = None
+
+def entry_path(kind, version, raw):
+    digest = hashlib.blake2b(raw, digest_size = 20)
+    digest.update(f"{kind}:{version}".encode("ASCII"))
+    return os.path.join(cache_dir, f"{digest.hexdigest()}.bin")
+
+""" array typecode of each NumPy (kind, itemsize). The dtype character can not be used,
+since it depends on the platform, int32 is "l" on Windows with NumPy 1.x """
+numpy_typecodes = {
+    ("i", 1): "b", ("u", 1): "B",
+    ("i", 2): "h", ("u", 2): "H",
+    ("i", 4): "i", ("u", 4): "I",
+    ("i", 8): "q", ("u", 8): "Q",
+    ("f", 4): "f", ("f", 8): "d"
+    }
+
+def encode_entry(fields, arrays):
+    """ fields has to be JSON serializable, arrays maps names to array.array or NumPy arrays """
+    layout = []
+    for name, values in arrays.items():
+        if isinstance(values, array):
+            typecode = values.typecode
+        else:
+            typecode = numpy_typecodes.get((values.dtype.kind, values.dtype.itemsize))
+        if typecode is None or array(typecode).itemsize != values.itemsize:
+            raise ValueError(f"Array \"{name}\" has no matching typecode")
+        layout.append((name, typecode, len(values) if isinstance(values, array) else values.size))
+    
+    header = json.dumps({"byteorder": sys.byteorder, "fields": fields, "arrays": layout}).encode("utf-8")
+    parts = [MAGIC, struct.pack("<I", len(header)), header]
+    parts.extend(values.tobytes() for values in arrays.values())
+    return b"".join(parts)
+
+def decode_entry(entry):
+    """ Returns the fields and a dict from name to array.array of an entry """
+    if entry[0:4] != MAGIC:
+        raise ValueError("Not a cache entry")
+    
+    length = struct.unpack_from("<I", entry, 4)[0]
+    header = json.loads(str(entry[8:8 + length], "utf-8"))
+    
+    arrays = {}
+    offset = 8 + length
+    for name, typecode, count in header["arrays"]:
+        values = array(typecode)
+        size = count * values.itemsize
+        if offset + size > len(entry):
+            raise ValueError("Entry is truncated")
+        values.frombytes(entry[offset:offset + size])
+        if header["byteorder"] != sys.byteorder:
+            values.byteswap()
+        arrays[name] = values
+        offset += size
+    
+    return header["fields"], arrays
+
+def fetch(kind, version, raw, decode):
+    """ Returns the cached parse result for the given file contents or None.
+    decode turns the fields and arrays given to store back into the parse result """
+    if cache_dir is None:
+        return None
+    
+    path = entry_path(kind, version, raw)
+    try:
+        with open(path, "rb") as f:
+            data = decode(*decode_entry(f.read()))
+    except FileNotFoundError:
+        return None
+    except Exception:
+        """ Unreadable or truncated entry, drop it so it is rewritten """
+        remove(path)
+        return None
+    
+    """ Mark as recently used """
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    
+    return data
+
+def store(kind, version, raw, data, encode):
+    """ Stores a parse result, encode returns its fields and arrays, see encode_entry.
+    Failing to write is never an error, the cache is only an optimization """
+    global current_size
+    if cache_dir is None:
+        return
+    
+    path = entry_path(kind, version, raw)
+    temp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok = True)
+        entry = encode_entry(*encode(data))
+        with open(temp, "wb") as f:
+            f.write(entry)
+        
+        """ Replacing is atomic, so concurrent readers never see partial entries """
+        os.replace(temp, path)
+        
+        if current_size is None:
+            current_size = sum(x[1] for x in list_entries())
+        else:
+            current_size += os.path.getsize(path)
+        
+        if current_size > max_size:
+            evict()
+    except (OSError, ValueError, TypeError):
+        remove(temp)
+
+def list_entries():
+    """ Returns (path, size, last use) for every entry """
+    entries = []
+    try:
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".bin"):
+                    stat = entry.stat()
+                    entries.append((entry.path, stat.st_size, stat.st_mtime))
+    except OSError:
+        pass
+    return entries
+
+def evict():
+    """ Removes the least recently used entries until the cache is below three quarters of max_size """
+    global current_size
+    entries = list_entries()
+    entries.sort(key = lambda x: x[2])
+    
+    current_size = sum(x[1] for x in entries)
+    for path, size, used in entries:
+        if current_size <= max_size * 3 // 4:
+            break
+        if remove(path):
+            current_size -= size
+
+def clear():
+    global current_size
+    for path, size, used in list_entries():
+        remove(path)
+    current_size = 0
+
+def remove(path):
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
@@ -0,0 +1,92 @@
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    from . import BmpLoad
+    from . import WadLoad
+except ImportError:
+    import BmpLoad
+    import WadLoad
+
+""" In memory cache of decoded BMP textures, shared by all imports of a Blender session.
+Entries are keyed by the resolved path, the modification time and the alpha index,
+so edited files are decoded again. The least recently used entries are dropped once
+the decoded buffers grow past max_size. """
+
+max_size = 256 * 1024 * 1024
+
+""" Key to (width, height, rgba), the most recently used entry is last """
+entries = OrderedDict()
+current_size = 0
+
+""" Imports may decode textures from worker threads """
+lock = threading.Lock()
+
+def configure(size):
+    global max_size
+    with lock:
+        max_size = size
+        evict()
+
+def source_key(source):
+    """ Returns the resolved path and modification time of a Path or WadEntry.
+    Archived files use the path of the archive and their name inside it """
+    if isinstance(source, WadLoad.WadEntry):
+        filepath = os.path.realpath(source.archive.filepath)
+        stat = os.stat(filepath)
+        return (filepath, WadLoad.normalize(source.name)), (stat.st_mtime_ns, stat.st_size)
+    
+    filepath = os.path.realpath(source)
+    stat = os.stat(filepath)
+    return filepath, (stat.st_mtime_ns, stat.st_size)
+
+def buffer_size(rgba):
+    return len(rgba) * rgba.itemsize
+
+def fetch(key):
+    with lock:
+        entry = entries.get(key)
+        if entry is not None:
+            entries.move_to_end(key)
+        return entry
+
+def store(key, entry):
+    global current_size
+    size = buffer_size(entry[2])
+    with lock:
+        if size > max_size:
+            return
+        old = entries.pop(key, None)
+        if old is not None:
+            current_size -= buffer_size(old[2])
+        entries[key] = entry
+        current_size += size
+        evict()
+
+def evict():
+    """ Drops the least recently used entries until the cache fits max_size, the lock has to be held """
+    global current_size
+    while current_size > max_size and entries:
+        key, entry = entries.popitem(last = False)
+        current_size -= buffer_size(entry[2])
+
+def clear():
+    global current_size
+    with lock:
+        entries.clear()
+        current_size = 0
+
+def decode_bmp(source, alpha_index = None):
+    """ Returns (width, height, rgba) of a Path or WadEntry, see BmpLoad.decode_rgba.
+    The buffer is shared between calls and must not be modified """
+    path, stamp = source_key(source)
+    key = (path, stamp, alpha_index)
+    
+    entry = fetch(key)
+    if entry is None:
+        bmp_data = BmpLoad.load_bmp(source)
+        entry = (bmp_data.width, bmp_data.height, BmpLoad.decode_rgba(bmp_data, alpha_index))
+        store(key, entry)
+    
+    return entry
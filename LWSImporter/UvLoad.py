@@ -1,39 +1,195 @@
+try:
+    from . import WadLoad
+    from . import ParseCache
+except ImportError:
+    import WadLoad
+    import ParseCache
+
+""" Bump whenever the parsed data changes, so cached results of older versions are not used """
+PARSER_VERSION = 2
+
+import warnings
+from array import array
+
+""" NumPy is optional, the pure Python paths are used if it is missing """
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 class UvData:
     
     def __init__(self):
         self.material_tex = {}
-        self.uvs = []
+        
+        """ Flat float32 array of (u, 1 - v) per loop, which can be handed to foreach_set("uv", ...).
+        NumPy array if NumPy is available, otherwise array.array("f") """
+        self.uvs = array("f")
+        
+        """ Amount of UVs of each polygon """
+        self.uv_counts = []
+
+def load_uv(source):
+    """ source can be a path, a WadEntry, a file-like or a bytes-like object """
+    
+    raw = WadLoad.read_source(source)
+    
+    data = ParseCache.fetch(__name__, PARSER_VERSION, raw, decode_cached)
+    if data is None:
+        data = parse_uv(raw)
+        ParseCache.store(__name__, PARSER_VERSION, raw, data, encode_cached)
+    
+    return data
+
+def encode_cached(data):
+    """ Returns the fields and arrays of UvData for ParseCache """
+    return {"material_tex": data.material_tex}, {"uvs": data.uvs, "uv_counts": array("i", data.uv_counts)}
 
-def load_uv(filepath):
+def decode_cached(fields, arrays):
+    data = UvData()
+    data.material_tex = fields["material_tex"]
+    data.uv_counts = arrays["uv_counts"].tolist()
+    if arrays["uvs"].typecode != "f":
+        raise ValueError("Cached UVs have the wrong type")
+    data.uvs = numpy.frombuffer(arrays["uvs"], dtype=numpy.float32) if numpy is not None else arrays["uvs"]
+    return data
+
+def read_lines(text, pos, count):
+    """ Returns count non empty lines starting at pos and the position after them """
+    lines = []
+    while len(lines) < count:
+        if pos >= len(text):
+            raise Exception("Unexpected end of file")
+        end = text.find("\n", pos)
+        if end < 0:
+            end = len(text)
+        line = text[pos:end].rstrip("\r")
+        pos = end + 1
+        if line != "":
+            lines.append(line)
+    return lines, pos
+
+def parse_uv(raw):
     
-    lines = None
-    with open(filepath, "r") as f:
-        lines = [x.rstrip("\r\n") for x in f.readlines()]
-    lines = [x for x in lines if x != ""]
+    text = str(raw, "latin-1")
     
     data = UvData()
     
+    lines, pos = read_lines(text, 0, 2)
     if int(lines[0]) != 2:
         raise Exception("Invalid magic")
     
     material_count = int(lines[1])
-    materials = lines[2:2+material_count]
-    paths = lines[2+material_count:2+2*material_count]
+    lines, pos = read_lines(text, pos, 2*material_count + 1)
+    materials = lines[0:material_count]
+    paths = lines[material_count:2*material_count]
     
     for i in range(material_count):
         data.material_tex[materials[i]] = paths[i]
     
-    polygons = int(lines[2+2*material_count])
+    polygons = int(lines[2*material_count])
+    if polygons == 0:
+        return data
+    
+    """ Every UV line has the same amount of values, usually u, v and w """
+    width = len(read_lines(text, pos, 2)[0][1].split())
     
-    j = 3+2*material_count
+    if not parse_uv_values(data, text[pos:], polygons, width):
+        """ Irregular file, parse it line by line """
+        parse_uv_lines(data, text[pos:], polygons)
+    
+    return data
+
+def parse_uv_values(data, body, polygons, width):
+    """ Parses all numbers of the polygon list in one go and gathers the coordinates in bulk.
+    The numbers are laid out as index, count and count * width values per polygon.
+    Returns False if the numbers do not match that layout """
+    try:
+        if numpy is not None:
+            with warnings.catch_warnings():
+                """ Older NumPy versions stop at malformed text with a warning, the size check catches that """
+                warnings.simplefilter("ignore", DeprecationWarning)
+                values = numpy.fromstring(body, dtype=numpy.float64, sep=" ")
+        else:
+            values = array("d", map(float, body.split()))
+    except ValueError:
+        return False
+    
+    """ Walk the polygon headers """
+    starts = []
+    counts = []
+    pos = 0
+    end = len(values)
+    for i in range(polygons):
+        if pos + 2 > end:
+            return False
+        count = int(values[pos + 1])
+        starts.append(pos + 2)
+        counts.append(count)
+        pos += 2 + count * width
+    
+    if pos != end:
+        return False
+    
+    if numpy is not None:
+        counts = numpy.array(counts, dtype=numpy.int64)
+        loopStarts = numpy.cumsum(counts) - counts
+        total = int(counts.sum())
+        
+        """ Position of the u value of every loop """
+        index = numpy.repeat(numpy.array(starts, dtype=numpy.int64), counts) + (numpy.arange(total) - numpy.repeat(loopStarts, counts)) * width
+        
+        uvs = numpy.empty(total * 2, dtype=numpy.float32)
+        uvs[0::2] = values[index]
+        uvs[1::2] = 1 - values[index + 1]
+        data.uvs = uvs
+        data.uv_counts = counts.tolist()
+    else:
+        uvs = array("f")
+        for i in range(polygons):
+            for j in range(starts[i], starts[i] + counts[i] * width, width):
+                uvs.append(values[j])
+                uvs.append(1 - values[j + 1])
+        data.uvs = uvs
+        data.uv_counts = counts
+    
+    return True
+
+def parse_uv_lines(data, body, polygons):
+    lines = [x for x in body.splitlines() if x != ""]
+    
+    uvs = array("f")
+    j = 0
     for i in range(polygons):
         uv_count = int(lines[j].split(" ")[1])
+        data.uv_counts.append(uv_count)
         j += 1
         for k in range(uv_count):
             split = lines[j].split(" ")
             j += 1
-            coords = [float(split[x]) for x in range(2)]
-            data.uvs.append((coords[0], 1 - coords[1]))
+            uvs.append(float(split[0]))
+            uvs.append(1 - float(split[1]))
     
-    return data
+    if numpy is not None:
+        data.uvs = numpy.frombuffer(uvs, dtype=numpy.float32).copy()
+    else:
+        data.uvs = uvs
+
+def check_layout(data, polVertCount):
+    """ Checks UvData against the polygons of its model, polVertCount is the vertex count of every polygon
+    as in LwoData. Raises an Exception naming the first polygon whose UV count does not match """
+    counts = data.uv_counts
+    if len(counts) != len(polVertCount):
+        raise Exception(f"UV file has {len(counts)} polygons, but the model has {len(polVertCount)}")
+    
+    if numpy is not None:
+        mismatch = numpy.flatnonzero(numpy.asarray(counts) != numpy.asarray(polVertCount))
+        if len(mismatch) == 0:
+            return
+        i = int(mismatch[0])
+    else:
+        i = next((i for i in range(len(counts)) if counts[i] != polVertCount[i]), None)
+        if i is None:
+            return
+    
+    raise Exception(f"Polygon {i} has {counts[i]} UVs, but {polVertCount[i]} vertices")
@@ -0,0 +1,180 @@
+import os
+import io
+import mmap
+import struct
+
+class WadEntry:
+    
+    def __init__(self, archive, name, offset, size):
+        self.archive = archive
+        
+        """ Name as stored in the archive, with backslashes as separators """
+        self.name = name
+        self.offset = offset
+        self.size = size
+    
+    @property
+    def path(self):
+        """ Name inside the archive with forward slashes """
+        return self.name.replace("\\", "/")
+    
+    @property
+    def parent(self):
+        """ Directory of the entry inside the archive """
+        return self.path.rpartition("/")[0]
+    
+    def read(self):
+        """ Returns the contents as a memoryview into the mapped archive, nothing is copied """
+        return self.archive.raw[self.offset:self.offset + self.size]
+    
+    def open(self):
+        return io.BytesIO(self.read())
+
+class WadArchive:
+    """ Read only LRR WAD archive.
+    The archive is memory mapped once and all names are indexed case insensitive.
+    
+    Layout: "WWAD", int32 count, count null terminated relative names,
+    count null terminated absolute names, count entries of int32 version, size, size, offset """
+    
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.map = None
+        self.raw = None
+        self.entries = {}
+        
+        """ Entries by file name alone, None for names that occur in several directories """
+        self.names = {}
+        
+        with open(filepath, "rb") as f:
+            if os.fstat(f.fileno()).st_size < 8:
+                raise Exception("File is too short")
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.raw = memoryview(self.map)
+        
+        try:
+            self.parse_index()
+        except:
+            self.close()
+            raise
+    
+    def parse_index(self):
+        raw = self.raw
+        if raw[0:4] != b"WWAD":
+            raise Exception("File does not start with WWAD")
+        
+        count = struct.unpack_from("<i", raw, 4)[0]
+        if count < 0:
+            raise Exception("Invalid file count")
+        
+        offset = 8
+        names = []
+        for i in range(count * 2):
+            end = self.map.find(b"\0", offset)
+            if end < 0:
+                raise Exception("Missing null termination")
+            names.append(str(raw[offset:end], "latin-1"))
+            offset = end + 1
+        
+        if offset + count * 16 > len(raw):
+            raise Exception("File entries are truncated")
+        
+        for i in range(count):
+            version, size, size2, dataOffset = struct.unpack_from("<4I", raw, offset + i * 16)
+            if dataOffset + size > len(raw):
+                raise Exception(f"Data of \"{names[i]}\" is out of bounds")
+            key = normalize(names[i])
+            entry = WadEntry(self, names[i], dataOffset, size)
+            self.entries[key] = entry
+            
+            name = key.rpartition("/")[2]
+            self.names[name] = None if name in self.names else entry
+    
+    def find(self, path):
+        """ Looks up a path case insensitive. If there is no exact match the leading directories are
+        dropped one by one, so paths of an extracted copy like "C:/LRR/Data/World/x.lwo" also match,
+        as long as at least the last directory matches. Otherwise the file name alone is looked up,
+        which only matches if no other directory of the archive has a file of that name """
+        parts = normalize(path).split("/")
+        
+        last = max(len(parts) - 2, 0)
+        for i in range(last + 1):
+            entry = self.entries.get("/".join(parts[i:]))
+            if entry:
+                return entry
+        return self.names.get(parts[-1])
+    
+    def exists(self, path):
+        return self.find(path) is not None
+    
+    def read(self, path):
+        entry = self.find(path)
+        if not entry:
+            raise FileNotFoundError(path)
+        return entry.read()
+    
+    def listdir(self, path):
+        """ Names of all files directly inside the directory, which has to be given as stored in the archive """
+        prefix = normalize(path)
+        if prefix:
+            prefix += "/"
+        return [x.path.rpartition("/")[2] for key, x in self.entries.items()
+                if key.startswith(prefix) and "/" not in key[len(prefix):]]
+    
+    def close(self):
+        """ The view has to be released before the map can be closed """
+        if self.raw is not None:
+            self.raw.release()
+            self.raw = None
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+
+def normalize(path):
+    """ Lower case, forward slashes and no empty or "." components """
+    parts = str(path).replace("\\", "/").lower().split("/")
+    return "/".join(x for x in parts if x not in ("", "."))
+
+""" Archives opened by open_wad, by path """
+archives = {}
+
+def load_wad(filepath):
+    return WadArchive(filepath)
+
+def open_wad(filepath):
+    """ Returns a shared archive, which is only mapped and indexed again if the file changed """
+    filepath = os.path.abspath(filepath)
+    stat = os.stat(filepath)
+    key = (stat.st_mtime_ns, stat.st_size)
+    
+    cached = archives.get(filepath)
+    if cached and cached[0] == key:
+        return cached[1]
+    
+    archive = WadArchive(filepath)
+    if cached:
+        try:
+            cached[1].close()
+        except BufferError:
+            """ Data read from the old archive is still in use, the map is freed along with it """
+            pass
+    archives[filepath] = (key, archive)
+    return archive
+
+def read_source(source):
+    """ Returns the contents of source, which can be a path, a WadEntry, a file-like object or a bytes-like object """
+    if isinstance(source, WadEntry):
+        return source.read()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return source
+    if hasattr(source, "read"):
+        return source.read()
+    
+    with open(source, "rb") as f:
+        return f.read()
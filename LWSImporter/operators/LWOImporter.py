@@ -29,14 +29,20 @@ class LRRLWO_PT_import_settings(bpy.types.Panel):
         operator = sfile.active_operator
         
         layout.prop(operator, "shared_path")
+        layout.prop(operator, "wad_path")
         layout.prop(operator, "reuse_assets")
         layout.prop(operator, "use_uv_files")
         layout.prop(operator, "filter_closest")
+        layout.prop(operator, "share_materials")
 
 import re
+import numpy
+import hashlib
 from .. import LwoLoad
 from .. import UvLoad
-from pathlib import Path
+from .. import WadLoad
+from .. import AssetResolver
+from pathlib import Path, PureWindowsPath
 class LWOImporter(bpy.types.Operator, ImportHelper):
     """LRR LWO Importer"""
     bl_idname = "import_mesh.lrrlwo"
@@ -51,6 +57,13 @@ class LWOImporter(bpy.types.Operator, ImportHelper):
         subtype = "DIR_PATH"
         )
     
+    wad_path: StringProperty(
+        name = "WAD archive",
+        description = "LRR WAD archive to read assets from when they are not found on disk. Paths are matched case insensitive against the archive",
+        default = "",
+        subtype = "FILE_PATH"
+        )
+    
     reuse_assets: BoolProperty(
         name = "Reuse materials and textures",
         description = "Reuse materials and texture if they already have been loaded into blender",
@@ -69,6 +82,18 @@ class LWOImporter(bpy.types.Operator, ImportHelper):
         default = False
         )
     
+    share_materials: BoolProperty(
+        name = "Share identical materials",
+        description = "Surfaces with the same color, flags and texture use one material, also across models",
+        default = False
+        )
+    
+    from_wad: BoolProperty(
+        description = "The file path is a path inside the WAD archive, used by the scene importer",
+        default = False,
+        options = {'HIDDEN'}
+        )
+    
     def execute(self, context):
         keywords = self.as_keywords(ignore=("axis_forward",
                                             "axis_up",
@@ -78,52 +103,108 @@ class LWOImporter(bpy.types.Operator, ImportHelper):
         path = Path(keywords["filepath"])
         dir = path.parent
         
-        lwo_data = LwoLoad.load_lwo(keywords["filepath"])
+        # Read from the WAD archive if the model is not on disk
+        wad = None
+        lwo_source = path
+        archive_dirs = ()
+        if keywords["wad_path"] != "":
+            wad = WadLoad.open_wad(keywords["wad_path"])
+            entry = wad.find(path) if keywords["from_wad"] or not path.exists() else None
+            if entry:
+                lwo_source = entry
+                archive_dirs = (entry.parent,)
+        
+        # Paths inside the archive are no paths on disk, they would be looked up relative to the working directory
+        if keywords["from_wad"]:
+            if lwo_source is path:
+                self.report({"ERROR"}, f"{path} not found in the WAD archive")
+                return {"CANCELLED"}
+            dir = None
+        
+        # Assets are searched next to the model first and in the shared folder second
+        resolver = AssetResolver.AssetResolver((dir, keywords["shared_path"]), wad, archive_dirs)
+        
+        lwo_data = LwoLoad.load_lwo(lwo_source)
         
         # Check if we should find a UV file and load it
         uv_data = None
-        uv_file_path = Path(dir.joinpath(path.stem + ".uv"))
+        uv_source = resolver.find(path.stem + ".uv")
         
-        # If the file does not exist, try to get one from the shared folder
-        if not uv_file_path.exists() and keywords["shared_path"] != "":
-            uv_file_path = Path(Path(keywords["shared_path"]).joinpath(uv_file_path.name))
+        if uv_source and keywords["use_uv_files"]:
+            # Check the UV file against the polygons before anything is created
+            try:
+                uv_data = UvLoad.load_uv(uv_source)
+                UvLoad.check_layout(uv_data, lwo_data.polVertCount)
+            except Exception as e:
+                self.report({"ERROR"}, f"UV file does not match {path.name}: {e}")
+                return {"CANCELLED"}
         
-        if uv_file_path.exists():
-            uv_data = UvLoad.load_uv(str(uv_file_path))
+        # UVs of all loops, from the UV file if present and setting is ticked, planar projected for surfaces with a texture
+        uvs = LwoLoad.loop_uvs(lwo_data, uv_data.uvs if keywords["use_uv_files"] and uv_data else None)
+        mesh = build_mesh(f"{path.stem} mesh", lwo_data, uvs)
         
-        mesh = bpy.data.meshes.new(f"{path.stem} mesh")
-        faces = []
-        offset = 0
-        for size in lwo_data.polVertCount:
-            faces.append(tuple(lwo_data.polVerts[offset:offset + size]))
-            offset += size
+        # The vertex indices of the file are not checked while parsing, so clean up broken files instead of keeping an invalid mesh
+        if mesh.validate():
+            self.report({"WARNING"}, f"{path.name} has invalid geometry, which has been removed")
         
-        mesh.from_pydata(lwo_data.verts, [], faces)
+        # Materials made by earlier imports, by signature, see surface_signature
+        shared = {}
+        if keywords["share_materials"]:
+            shared = {x["lrr_signature"]: x for x in bpy.data.materials if "lrr_signature" in x}
         
-        # Set materials for polygons
-        for i in range(len(lwo_data.polSurfId)):
-            mesh.polygons[i].material_index = lwo_data.polSurfId[i] - 1
+        # Find the textures of all materials that have to be created, and decode them while the materials are built
+        textures = {}
+        signatures = {}
+        created = []
+        for surfName in lwo_data.surfNames:
+            surf = lwo_data.surfs[surfName]
+            
+            imgpath = None
+            if keywords["use_uv_files"] and uv_data and surfName in uv_data.material_tex:
+                imgpath = PureWindowsPath(uv_data.material_tex[surfName])
+            elif surf.ctex:
+                imgpath = PureWindowsPath(surf.ctex.filepath)
+            else:
+                continue
+            
+            imgname = imgpath.name
+            imgpath = resolver.find(imgname)
+            
+            # Not found, let loading report the missing file, models from the archive have no folder to fall back to
+            if imgpath is None:
+                fallback = keywords["shared_path"] or dir
+                if fallback is None:
+                    self.report({"WARNING"}, f"Texture {imgname} not found")
+                    continue
+                imgpath = Path(Path(fallback).joinpath(imgname))
+            
+            textures[surfName] = (imgname, imgpath)
         
-        """ Create new uv layer """
-        uvd = mesh.uv_layers.new().data
+        # Only decode the textures of materials that are not reused
+        for surfName in lwo_data.surfNames:
+            surf = lwo_data.surfs[surfName]
+            texture = textures.get(surfName)
+            
+            if keywords["share_materials"]:
+                use_uv = keywords["use_uv_files"] and uv_data and surfName in uv_data.material_tex
+                interpolation = texture_interpolation(surf, use_uv, keywords["filter_closest"]) if texture else None
+                signatures[surfName] = surface_signature(surf, texture, interpolation)
+            
+            if keywords["reuse_assets"] and f"{path.stem}_{surfName}" in bpy.data.materials:
+                continue
+            if signatures.get(surfName) in shared:
+                continue
+            if texture:
+                created.append(texture)
         
-        # Apply UV file if present and setting is ticked
-        if keywords["use_uv_files"] and uv_data:
-            k = 0
-            for i in range(len(mesh.polygons)):
-                polygon = mesh.polygons[i]
-                for j in range(len(polygon.vertices)):
-                    uvd[polygon.loop_start + j].uv = uv_data.uvs[k + j]
-                k += len(polygon.vertices)
+        decoded = prefetch_textures(created, keywords["reuse_assets"])
         
-        index = 0
         """ Generate materials """
         for surfName in lwo_data.surfNames:
             surf = lwo_data.surfs[surfName]
             
             use_uv = keywords["use_uv_files"] and uv_data and surfName in uv_data.material_tex
             
-            index += 1
             mat = None
             matname = f"{path.stem}_{surfName}"
             
@@ -132,88 +213,33 @@ class LWOImporter(bpy.types.Operator, ImportHelper):
                 if matname in bpy.data.materials:
                     mat = bpy.data.materials[matname]
             
+            # Or use the material of an identical surface
+            signature = signatures.get(surfName)
+            if not mat and signature in shared:
+                mat = shared[signature]
+            
             # Create material if not found/used
             if not mat:
-                """ Add new material """
-                mat = bpy.data.materials.new(name = matname)
-                mat.blend_method = "BLEND"
-                mat.shadow_method = "NONE"
-                mat.show_transparent_back = False
-                mat.use_backface_culling = not surf.doubleSided
+                """ Copy the material of this shape and only set what differs between surfaces """
+                # Textures that could not be found anywhere were skipped above
+                textured = bool(surf.ctex or use_uv) and surfName in textures
+                mat = material_template(surf.doubleSided, surf.additive and textured, textured).copy()
+                mat.name = matname
                 
-                mat.use_nodes = True
                 tree = mat.node_tree
-                
-                positions = {
-                    "Principled BSDF": (10, 300),
-                    "Transparent BSDF": (10, 400),
-                    "Geometry": (10, 650),
-                    "Mix Shader": (300, 400),
-                    "Material Output": (500, 300),
-                    "Image Texture": (-540, 300),
-                    "Attribute": (-440, -150),
-                    "Math": (-190, -150),
-                    "Mix Shader.001": (10, 850),
-                    "Combine HSV": (-440, 700),
-                    "Separate HSV": (-440, 500),
-                    "Emission": (-190, 650),
-                    "Math.001": (-190, 500)
-                    }
-                
-                out = tree.nodes["Material Output"]
-                
-                bsdf = tree.nodes["Principled BSDF"]
-                bsdf.inputs["Base Color"].default_value = (*surf.color, 1)
-                bsdf.inputs["Specular"].default_value = 0
-                
-                geom = tree.nodes.new("ShaderNodeNewGeometry")
-                
-                trans = tree.nodes.new("ShaderNodeBsdfTransparent")
-                
-                mix = tree.nodes.new("ShaderNodeMixShader")
-                mix.inputs[0].default_value = 0.0 # Default no face culling
-                
-                tree.links.new(mix.outputs[0], out.inputs[0])
-                tree.links.new(trans.outputs[0], mix.inputs[2])
-                tree.links.new(bsdf.outputs[0], mix.inputs[1])
-                
-                if not surf.doubleSided:
-                    tree.links.new(mix.inputs[0], geom.outputs["Backfacing"])
-                
-                math = tree.nodes.new("ShaderNodeMath")
-                math.operation = "MULTIPLY"
-                math.inputs[0].default_value = 1.0
-                math.use_clamp = True
-                
-                alpha = tree.nodes.new("ShaderNodeAttribute")
-                alpha.attribute_name = "Alpha"
-                alpha.attribute_type = "OBJECT"
-                
-                tree.links.new(alpha.outputs[2], math.inputs[1])
-                tree.links.new(math.outputs[0], bsdf.inputs[21])
+                tree.nodes["Principled BSDF"].inputs["Base Color"].default_value = (*surf.color, 1)
                 
                 """ Add texture if present """
-                if surf.ctex or use_uv:
-                    ctex = surf.ctex
-                    tex = tree.nodes.new("ShaderNodeTexImage")
+                if textured:
+                    tex = tree.nodes["Image Texture"]
                     
                     """ Load and set image """
-                    imgpath = None
-                    if use_uv:
-                        imgpath = Path(uv_data.material_tex[surfName])
-                    elif ctex:
-                        imgpath = Path(ctex.filepath)
-                    
-                    imgname = imgpath.name
-                    imgpath = Path(dir.joinpath(imgname))
+                    imgname, imgpath = textures[surfName]
                     
-                    # If the file does not exist, try to get one from the shared folder
-                    if not imgpath.exists() and keywords["shared_path"] != "":
-                        imgpath = Path(Path(keywords["shared_path"]).joinpath(imgname))
+                    sequence_match = sequence_pattern.match(imgname)
                     
-                    sequence_match = re.match(r"^.*[^\d]+(\d{3,})\..*$", imgpath.name)
-                    
-                    if sequence_match:
+                    # Blender can only load sequences from disk, archived sequences only use their first frame
+                    if sequence_match and isinstance(imgpath, Path):
                         
                         if keywords["reuse_assets"] and imgname in bpy.data.images:
                             img = bpy.data.images[imgname]
@@ -223,25 +249,10 @@ class LWOImporter(bpy.types.Operator, ImportHelper):
                             img.source = "SEQUENCE"
                             tex.image = img
                         
-                        startFrame = int(sequence_match.group(1))
-                        stopFrame = startFrame
-                        digitSpan = sequence_match.span(1)
-                        pad = digitSpan[1] - digitSpan[0]
-                        
-                        imgdir = imgpath.parent
-                        seqImgPrefix = imgname[:digitSpan[0]]
-                        seqImgPostfix = imgname[digitSpan[1]:]
-                        
-                        seqImg = Path(imgdir.joinpath(f"{seqImgPrefix}{str(stopFrame).zfill(pad)}{seqImgPostfix}"))
-                        
-                        while seqImg.exists():
-                            stopFrame += 1
-                            seqImg = Path(imgdir.joinpath(f"{seqImgPrefix}{str(stopFrame).zfill(pad)}{seqImgPostfix}"))
-                        
                         user = tex.image_user
                         user.use_auto_refresh = True
                         user.use_cyclic = True
-                        user.frame_duration = stopFrame - startFrame
+                        user.frame_duration = resolver.sequence_length(imgpath, sequence_match)
                         
                     else:
                         if keywords["reuse_assets"] and imgname in bpy.data.images:
@@ -249,85 +260,17 @@ class LWOImporter(bpy.types.Operator, ImportHelper):
                             img = bpy.data.images[imgname]
                             tex.image = img
                         else:
-                            # Load image
-                            img = load_texture(imgpath)
+                            # Load image, the pixels of BMPs are usually decoded already
+                            img = load_texture(imgname, imgpath, decoded.get(imgname))
                             tex.image = img
                     
-                    
-                    tex.extension = "REPEAT"
-                    
-                    if keywords["filter_closest"]:
-                        tex.interpolation = "Closest"
-                    elif use_uv or ctex.interpolate:
-                        tex.interpolation = "Linear"
-                    else:
-                        tex.interpolation = "Closest"
-                    
-                    if surf.additive:
-                        
-                        # Modify shader to display additive
-                        mix2 = tree.nodes.new("ShaderNodeMixShader")
-                        emission = tree.nodes.new("ShaderNodeEmission")
-                        math2 = tree.nodes.new("ShaderNodeMath")
-                        sep = tree.nodes.new("ShaderNodeSeparateHSV")
-                        comb = tree.nodes.new("ShaderNodeCombineHSV")
-                        
-                        # Configure default values and settings
-                        math2.operation = "MULTIPLY"
-                        math2.inputs[0].default_value = 1.0
-                        math2.use_clamp = True
-                        
-                        comb.inputs[2].default_value = 1.0
-                        
-                        # Create links
-                        links = tree.links
-                        
-                        # Tex -> seperate HSV
-                        links.new(tex.outputs[0], sep.inputs[0])
-                        
-                        # Sep HSV -> Comb HSV
-                        links.new(sep.outputs[0], comb.inputs[0])
-                        links.new(sep.outputs[1], comb.inputs[1])
-                        
-                        # Math 2
-                        links.new(sep.outputs[2], math2.inputs[0])
-                        links.new(math.outputs[0], math2.inputs[1])
-                        links.new(math2.outputs[0], mix2.inputs[0])
-                        
-                        # Emission
-                        links.new(comb.outputs[0], emission.inputs[0])
-                        
-                        # Mix 2
-                        links.new(math2.outputs[0], mix2.inputs[0])
-                        links.new(trans.outputs[0], mix2.inputs[1])
-                        links.new(emission.outputs[0], mix2.inputs[2])
-                        links.new(mix2.outputs[0], mix.inputs[1])
-                        
-                    else:
-                        tree.links.new(tex.outputs[0], bsdf.inputs[0])
-                        tree.links.new(tex.outputs[1], math.inputs[0])
+                    tex.interpolation = texture_interpolation(surf, use_uv, keywords["filter_closest"])
                 
-                """ Apply positions """
-                for node in tree.nodes:
-                    loc = node.location
-                    loc.x, loc.y = positions[node.name]
+                if signature:
+                    mat["lrr_signature"] = signature
+                    shared[signature] = mat
             
             mesh.materials.append(mat)
-            """ Set uv """
-            k = 0
-            for i in range(len(lwo_data.polSurfId)):
-                inds = faces[i]
-                
-                # Set UV
-                polygon = mesh.polygons[i]
-                if lwo_data.polSurfId[i] == index and surf.ctex:
-                    for j in range(len(polygon.vertices)):
-                        vertex = mesh.vertices[polygon.vertices[j]].co
-                        uvd[polygon.loop_start + j].uv = LwoLoad.planar_project(surf.ctex, vertex)
-                
-                
-                
-                k += lwo_data.polVertCount[i]
         
         mesh.calc_normals_split()
         mesh.calc_normals()
@@ -353,40 +296,251 @@ class LWOImporter(bpy.types.Operator, ImportHelper):
     def draw(self, context):
         pass
 
-from .. import BmpLoad
-def load_texture(path):
+def texture_interpolation(surf, use_uv, filter_closest):
+    if filter_closest:
+        return "Closest"
+    elif use_uv or surf.ctex.interpolate:
+        return "Linear"
+    else:
+        return "Closest"
+
+def surface_signature(surf, texture, interpolation):
+    """ Hash of everything that ends up in the material of a surface, stored in the "lrr_signature" property.
+    texture is the (name, source) of the resolved image or None """
+    source = None
+    if texture:
+        source = texture[1]
+        if isinstance(source, WadLoad.WadEntry):
+            source = f"{source.archive.filepath}:{source.path}"
+        else:
+            source = str(source)
     
-    # if the image is a BMP image with AXXX_ as prefix, use custom loader, otherwise use in-built
-    # See if it matches
-    match = re.match(r"^[Aa](\d{3})_.*$", path.name)
-    if path.suffix.lower() == ".bmp" and not match is None:
+    ctex = surf.ctex
+    projection = (ctex.projAxis, tuple(ctex.size), tuple(ctex.center)) if ctex else None
+    
+    parts = (tuple(surf.color), surf.doubleSided, surf.additive, source, interpolation, projection)
+    return hashlib.blake2b(repr(parts).encode("utf-8"), digest_size = 16).hexdigest()
+
+def material_template(doubleSided, additive, textured):
+    """ Returns the hidden material that all materials of this shape are copied from, it is built on first use.
+    Copies only need their color, image and interpolation set """
+    name = f".LRR {'double' if doubleSided else 'single'} sided{' additive' if additive else ''}{' textured' if textured else ''}"
+    if name in bpy.data.materials:
+        return bpy.data.materials[name]
+    
+    """ Add new material """
+    mat = bpy.data.materials.new(name = name)
+    mat.blend_method = "BLEND"
+    mat.shadow_method = "NONE"
+    mat.show_transparent_back = False
+    mat.use_backface_culling = not doubleSided
+    
+    mat.use_nodes = True
+    tree = mat.node_tree
+    
+    positions = {
+        "Principled BSDF": (10, 300),
+        "Transparent BSDF": (10, 400),
+        "Geometry": (10, 650),
+        "Mix Shader": (300, 400),
+        "Material Output": (500, 300),
+        "Image Texture": (-540, 300),
+        "Attribute": (-440, -150),
+        "Math": (-190, -150),
+        "Mix Shader.001": (10, 850),
+        "Combine HSV": (-440, 700),
+        "Separate HSV": (-440, 500),
+        "Emission": (-190, 650),
+        "Math.001": (-190, 500)
+        }
+    
+    out = tree.nodes["Material Output"]
+    
+    bsdf = tree.nodes["Principled BSDF"]
+    bsdf.inputs["Specular"].default_value = 0
+    
+    geom = tree.nodes.new("ShaderNodeNewGeometry")
+    
+    trans = tree.nodes.new("ShaderNodeBsdfTransparent")
+    
+    mix = tree.nodes.new("ShaderNodeMixShader")
+    mix.inputs[0].default_value = 0.0 # Default no face culling
+    
+    tree.links.new(mix.outputs[0], out.inputs[0])
+    tree.links.new(trans.outputs[0], mix.inputs[2])
+    tree.links.new(bsdf.outputs[0], mix.inputs[1])
+    
+    if not doubleSided:
+        tree.links.new(mix.inputs[0], geom.outputs["Backfacing"])
+    
+    math = tree.nodes.new("ShaderNodeMath")
+    math.operation = "MULTIPLY"
+    math.inputs[0].default_value = 1.0
+    math.use_clamp = True
+    
+    alpha = tree.nodes.new("ShaderNodeAttribute")
+    alpha.attribute_name = "Alpha"
+    alpha.attribute_type = "OBJECT"
+    
+    tree.links.new(alpha.outputs[2], math.inputs[1])
+    tree.links.new(math.outputs[0], bsdf.inputs[21])
+    
+    """ Add texture node, the image is set on the copies """
+    if textured:
+        tex = tree.nodes.new("ShaderNodeTexImage")
+        tex.extension = "REPEAT"
         
-        # Get the index for the transparent color
-        alphaIndex = int(match.group(1))
+        if additive:
+            
+            # Modify shader to display additive
+            mix2 = tree.nodes.new("ShaderNodeMixShader")
+            emission = tree.nodes.new("ShaderNodeEmission")
+            math2 = tree.nodes.new("ShaderNodeMath")
+            sep = tree.nodes.new("ShaderNodeSeparateHSV")
+            comb = tree.nodes.new("ShaderNodeCombineHSV")
+            
+            # Configure default values and settings
+            math2.operation = "MULTIPLY"
+            math2.inputs[0].default_value = 1.0
+            math2.use_clamp = True
+            
+            comb.inputs[2].default_value = 1.0
+            
+            # Create links
+            links = tree.links
+            
+            # Tex -> seperate HSV
+            links.new(tex.outputs[0], sep.inputs[0])
+            
+            # Sep HSV -> Comb HSV
+            links.new(sep.outputs[0], comb.inputs[0])
+            links.new(sep.outputs[1], comb.inputs[1])
+            
+            # Math 2
+            links.new(sep.outputs[2], math2.inputs[0])
+            links.new(math.outputs[0], math2.inputs[1])
+            links.new(math2.outputs[0], mix2.inputs[0])
+            
+            # Emission
+            links.new(comb.outputs[0], emission.inputs[0])
+            
+            # Mix 2
+            links.new(math2.outputs[0], mix2.inputs[0])
+            links.new(trans.outputs[0], mix2.inputs[1])
+            links.new(emission.outputs[0], mix2.inputs[2])
+            links.new(mix2.outputs[0], mix.inputs[1])
+            
+        else:
+            tree.links.new(tex.outputs[0], bsdf.inputs[0])
+            tree.links.new(tex.outputs[1], math.inputs[0])
+    
+    """ Apply positions """
+    for node in tree.nodes:
+        loc = node.location
+        loc.x, loc.y = positions[node.name]
+    
+    return mat
+
+def build_mesh(name, lwo_data, uvs = None):
+    """ Creates a mesh from LwoData with bulk foreach_set calls, each polygon becomes one face.
+    Materials are indexed by surface id and a UV layer is always added, filled with uvs if given.
+    uvs has to hold a UV per loop in polygon order, as UvData.uvs """
+    verts = numpy.asarray(lwo_data.verts, dtype=numpy.float32).reshape(-1)
+    polVerts = numpy.asarray(lwo_data.polVerts, dtype=numpy.int32)
+    polStart = numpy.asarray(lwo_data.polStart, dtype=numpy.int32)
+    polVertCount = numpy.asarray(lwo_data.polVertCount, dtype=numpy.int32)
+    
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(verts) // 3)
+    mesh.loops.add(len(polVerts))
+    mesh.polygons.add(len(polStart))
+    
+    mesh.vertices.foreach_set("co", verts)
+    mesh.loops.foreach_set("vertex_index", polVerts)
+    mesh.polygons.foreach_set("loop_start", polStart)
+    # Newer Blender versions derive the loop totals from the starts and make them read only
+    if not bpy.types.MeshPolygon.bl_rna.properties["loop_total"].is_readonly:
+        mesh.polygons.foreach_set("loop_total", polVertCount)
+    
+    # Set materials for polygons
+    mesh.polygons.foreach_set("material_index", numpy.asarray(lwo_data.polSurfId, dtype=numpy.int32) - 1)
+    
+    """ Create new uv layer """
+    uvd = mesh.uv_layers.new().data
+    if uvs is not None:
+        # The UVs are stored per loop in polygon order, same as the mesh loops
+        uvd.foreach_set("uv", uvs)
+    
+    mesh.update(calc_edges = True)
+    return mesh
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from .. import TextureCache
+
+""" BMPs named A###_ use palette index ### as transparent color """
+alpha_pattern = re.compile(r"^[Aa](\d{3})_.*$")
+""" Images ending in a frame number of at least 3 digits are loaded as sequence """
+sequence_pattern = re.compile(r"^.*[^\d]+(\d{3,})\..*$")
+
+def bmp_alpha_index(name):
+    """ Returns the transparent palette index of an A###_ BMP, or None for images Blender loads itself """
+    match = alpha_pattern.match(name)
+    if name.lower().endswith(".bmp") and not match is None:
+        return int(match.group(1))
+    return None
+
+def prefetch_textures(textures, reuse_assets):
+    """ Decodes the A###_ BMPs of the given (name, source) pairs in worker threads.
+    Returns a future of TextureCache.decode_bmp per image name. Only decoding happens in the workers,
+    the images are created by load_texture on the main thread, since bpy is not thread safe """
+    pool = None
+    pending = {}
+    for name, source in textures:
+        if name in pending or (reuse_assets and name in bpy.data.images):
+            continue
         
-        # Load BMP color table and pixels
-        bmp_data = BmpLoad.load_bmp(str(path))
+        alphaIndex = bmp_alpha_index(name)
+        # Sequences on disk are loaded by Blender
+        if alphaIndex is None or (sequence_pattern.match(name) and isinstance(source, Path)):
+            continue
         
-        w = bmp_data.width
-        h = bmp_data.height
-        img = bpy.data.images.new(path.name, w, h)
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers = min(8, os.cpu_count() or 1))
+        pending[name] = pool.submit(TextureCache.decode_bmp, source, alphaIndex)
+    
+    # The submitted textures are still decoded, this only frees the threads once they are done
+    if pool is not None:
+        pool.shutdown(wait = False)
+    
+    return pending
+
+def load_texture(name, source, decoded = None):
+    """ source is either a Path or a WadEntry, decoded an optional future from prefetch_textures """
+    
+    # if the image is a BMP image with AXXX_ as prefix, use custom loader, otherwise use in-built
+    alphaIndex = bmp_alpha_index(name)
+    if alphaIndex is not None:
         
-        for y in range(h):
-            for x in range(w):
-                i = y * w + x
-                ind = bmp_data.pixels[i]
-                col = bmp_data.colors[ind]
-                img.pixels[i*4 + 0] = col[0]
-                img.pixels[i*4 + 1] = col[1]
-                img.pixels[i*4 + 2] = col[2]
-                
-                # Set alpha
-                if ind == alphaIndex:
-                    img.pixels[i*4 + 3] = 0
-                else:
-                    img.pixels[i*4 + 3] = 1
+        # Decode the BMP, or reuse the pixels decoded by an earlier import
+        if decoded is not None:
+            w, h, rgba = decoded.result()
+        else:
+            w, h, rgba = TextureCache.decode_bmp(source, alphaIndex)
+        
+        # One bulk copy, indexed writes to img.pixels go through RNA for every single float
+        img = bpy.data.images.new(name, w, h)
+        img.pixels.foreach_set(rgba)
+        img.update()
         
         return img
+    elif isinstance(source, Path):
+        return bpy.data.images.load(str(source))
     else:
-        return bpy.data.images.load(str(path))
+        # Let blender decode the archived file from memory
+        raw = bytes(WadLoad.read_source(source))
+        img = bpy.data.images.new(name, 1, 1)
+        img.pack(data = raw, data_len = len(raw))
+        img.source = "FILE"
+        return img
     
@@ -29,12 +29,18 @@ class LRRLWS_PT_import_settings(bpy.types.Panel):
         operator = sfile.active_operator
         
         layout.prop(operator, "shared_path")
+        layout.prop(operator, "wad_path")
         layout.prop(operator, "reuse_assets")
         layout.prop(operator, "use_uv_files")
         layout.prop(operator, "filter_closest")
+        layout.prop(operator, "share_materials")
+        layout.prop(operator, "instance_meshes")
 
+import numpy
 from .. import LwsLoad
-from pathlib import Path
+from .. import WadLoad
+from .. import AssetResolver
+from pathlib import Path, PureWindowsPath
 class LWSImporter(bpy.types.Operator, ImportHelper):
     """LRR LWS Importer"""
     bl_idname = "import_scene.lrrlws"
@@ -49,6 +55,13 @@ class LWSImporter(bpy.types.Operator, ImportHelper):
         subtype = "DIR_PATH"
         )
     
+    wad_path: StringProperty(
+        name = "WAD archive",
+        description = "LRR WAD archive to read assets from when they are not found on disk. Paths are matched case insensitive against the archive",
+        default = "",
+        subtype = "FILE_PATH"
+        )
+    
     reuse_assets: BoolProperty(
         name = "Reuse materials and textures",
         description = "Reuse materials and texture if they already have been loaded into blender",
@@ -67,7 +80,24 @@ class LWSImporter(bpy.types.Operator, ImportHelper):
         default = False
         )
     
+    share_materials: BoolProperty(
+        name = "Share identical materials",
+        description = "Surfaces with the same color, flags and texture use one material, also across models",
+        default = False
+        )
+    
+    instance_meshes: BoolProperty(
+        name = "Instance repeated models",
+        description = "Objects loading the same model share one mesh, which is only imported once",
+        default = True
+        )
+    
     def execute(self, context):
+        # The directories are listed once for the scene and all of its objects
+        with AssetResolver.session():
+            return self.import_scene(context)
+    
+    def import_scene(self, context):
         keywords = self.as_keywords(ignore=("axis_forward",
                                             "axis_up",
                                             "filter_glob",
@@ -76,7 +106,21 @@ class LWSImporter(bpy.types.Operator, ImportHelper):
         path = Path(keywords["filepath"])
         dir = path.parent
         
-        lws_anim = LwsLoad.load_lws(str(path))
+        # Read from the WAD archive if the scene is not on disk
+        wad = None
+        lws_source = path
+        archive_dirs = ()
+        if keywords["wad_path"] != "":
+            wad = WadLoad.open_wad(keywords["wad_path"])
+            entry = wad.find(path) if not path.exists() else None
+            if entry:
+                lws_source = entry
+                archive_dirs = (entry.parent,)
+        
+        lws_anim = LwsLoad.load_lws(lws_source)
+        
+        # Models of an archived scene are searched in its archive folder instead of next to it on disk
+        resolver = AssetResolver.AssetResolver((dir, keywords["shared_path"]), wad, archive_dirs)
         
         # Create base to put stuff into
         base = bpy.data.objects.new(path.name, None)
@@ -87,6 +131,10 @@ class LWSImporter(bpy.types.Operator, ImportHelper):
         collection.objects.link(base)
         
         
+        # Meshes of the imported models, by path and import settings
+        settings = {k: keywords[k] for k in ("shared_path", "wad_path", "reuse_assets", "use_uv_files", "filter_closest", "share_materials")}
+        meshes = {}
+        
         # Create the objects
         pivots = []
         objects = []
@@ -95,27 +143,42 @@ class LWSImporter(bpy.types.Operator, ImportHelper):
             obj = None
             if x.filepath:
                 # Load lwo
-                raw_lwo_path = Path(x.filepath)
-                lwo_path = dir.joinpath(raw_lwo_path.name)
+                raw_lwo_path = PureWindowsPath(x.filepath)
+                lwo_path = resolver.find(raw_lwo_path.name)
                 
-                if not lwo_path.exists():
+                # Archive paths are passed on as such, so the model importer does not look for them on disk
+                from_wad = isinstance(lwo_path, WadLoad.WadEntry)
+                if from_wad:
+                    lwo_path = lwo_path.path
+                elif lwo_path is None:
+                    lwo_path = dir.joinpath(raw_lwo_path.name)
                     if keywords["shared_path"] != "":
                         lwo_path = Path(keywords["shared_path"]).joinpath(raw_lwo_path.name)
                 
-                status = None
-                try:
-                    status = bpy.ops.import_mesh.lrrlwo(filepath = str(lwo_path), shared_path = keywords["shared_path"], reuse_assets = keywords["reuse_assets"], use_uv_files = keywords["use_uv_files"], filter_closest = keywords["filter_closest"])
-                except Exception as e:
-                    print("Failed to load {lwo_path} :")
-                    print(e)
+                mesh_key = (str(lwo_path), from_wad, *settings.values())
                 
-                if status != {"FINISHED"}:
-                    # Create empty
-                    obj = bpy.data.objects.new(x.name, None)
+                if keywords["instance_meshes"] and mesh_key in meshes:
+                    # Same model as an earlier object, only create the object
+                    obj = bpy.data.objects.new(x.name, meshes[mesh_key])
+                    obj["Alpha"] = 1.0
+                    obj.visible_shadow = False
                     collection.objects.link(obj)
                 else:
-                    obj = bpy.context.object
-                    obj.name = x.name
+                    status = None
+                    try:
+                        status = bpy.ops.import_mesh.lrrlwo(filepath = str(lwo_path), from_wad = from_wad, **settings)
+                    except Exception as e:
+                        print("Failed to load {lwo_path} :")
+                        print(e)
+                    
+                    if status != {"FINISHED"}:
+                        # Create empty
+                        obj = bpy.data.objects.new(x.name, None)
+                        collection.objects.link(obj)
+                    else:
+                        obj = bpy.context.object
+                        obj.name = x.name
+                        meshes[mesh_key] = obj.data
             else:
                 # Create empty
                 obj = bpy.data.objects.new(x.name, None)
@@ -136,48 +199,14 @@ class LWSImporter(bpy.types.Operator, ImportHelper):
             else:
                 pivots.append(None)
             
-            # Set keyframe data
-            for frame in x.keyframes:
-                fdata = x.keyframes[frame]
-                
-                if pivot:
-                    pivot.location = tuple(fdata[0][i] + fdata[2][i] * x.pivot[i] for i in range(3))
-                    pivot.keyframe_insert("location", frame = frame)
-                    
-                    rot = fdata[1]
-                    # Weird conversion
-                    pivot.rotation_euler = (rot[1], rot[0], rot[2])
-                    pivot.keyframe_insert("rotation_euler", frame = frame)
-                    
-                    pivot.scale = fdata[2]
-                    pivot.keyframe_insert("scale", frame = frame)
-                else:
-                    obj.location = fdata[0]
-                    obj.keyframe_insert("location", frame = frame)
-                    
-                    rot = fdata[1]
-                    # Weird conversion
-                    obj.rotation_euler = (rot[1], rot[0], rot[2])
-                    obj.keyframe_insert("rotation_euler", frame = frame)
-                    
-                    obj.scale = fdata[2]
-                    obj.keyframe_insert("scale", frame = frame)
+            # Set keyframe data, transforms go on the pivot if there is one
+            write_keyframes(pivot if pivot else obj, x.keyframes, x.pivot if pivot else None)
             
             # Set alpha keyframes
-            for frame in x.alphaKeyframes:
-                obj["Alpha"] = 1.0 - float(x.alphaKeyframes[frame])
-                obj.keyframe_insert("[\"Alpha\"]", frame = frame)
-            
-            # Make sure the keyframes interpolate linear
-            action = None
-            if pivot:
-                action = pivot.id_data.animation_data.action
-            else:
-                action = obj.id_data.animation_data.action
-            
-            for fcurve in action.fcurves:
-                for keyframe in fcurve.keyframe_points:
-                    keyframe.interpolation = "LINEAR"
+            if len(x.alphaKeyframes) > 0:
+                alpha = 1.0 - numpy.frombuffer(x.alphaKeyframes.data, dtype=numpy.float64)
+                obj["Alpha"] = float(alpha[-1])
+                set_fcurves(obj, "[\"Alpha\"]", x.alphaKeyframes.frames, alpha.reshape(-1, 1))
             
             # Update data to make keyframes work, but only if we have data
             if obj.data:
@@ -206,17 +235,98 @@ class LWSImporter(bpy.types.Operator, ImportHelper):
         bpy.context.scene.frame_end = lws_anim.lastFrame
         bpy.context.scene.frame_set(bpy.context.scene.frame_start)
         
-        # Flip normals if they have been scaled with -1
+        # Flip normals if they have been scaled with -1. Instances share their mesh, so each mesh is flipped
+        # at most once, and mirrored instances get their own copy if other instances of the mesh are not mirrored
+        users = {}
         for obj in objects:
-            if obj.matrix_world.determinant() < 0 and obj.data:
-                bpy.ops.object.select_all(action='DESELECT')
-                bpy.context.view_layer.objects.active = obj
-                bpy.ops.object.mode_set(mode = "EDIT")
-                bpy.ops.mesh.select_all(action='SELECT')
-                bpy.ops.mesh.flip_normals()
-                bpy.ops.object.mode_set(mode = "OBJECT")
+            if obj.data:
+                users.setdefault(obj.data, []).append(obj)
+        
+        for mesh, mesh_objects in users.items():
+            mirrored = [x for x in mesh_objects if x.matrix_world.determinant() < 0]
+            if not mirrored:
+                continue
+            
+            if len(mirrored) < len(mesh_objects):
+                mesh = mesh.copy()
+                for obj in mirrored:
+                    obj.data = mesh
+            
+            bpy.ops.object.select_all(action='DESELECT')
+            bpy.context.view_layer.objects.active = mirrored[0]
+            bpy.ops.object.mode_set(mode = "EDIT")
+            bpy.ops.mesh.select_all(action='SELECT')
+            bpy.ops.mesh.flip_normals()
+            bpy.ops.object.mode_set(mode = "OBJECT")
         
         return {"FINISHED"}
     
     def draw(self, context):
         pass
+
+""" Value of the LINEAR interpolation for foreach_set """
+INTERPOLATION_LINEAR = 1
+
+def get_action(target):
+    """ Returns the action of target, created with the name keyframe_insert would give it """
+    anim = target.animation_data
+    if anim is None:
+        anim = target.animation_data_create()
+    if anim.action is None:
+        anim.action = bpy.data.actions.new(f"{target.name}Action")
+    return anim.action
+
+def set_fcurves(target, data_path, frames, values, group = None):
+    """ Keys data_path of target with linear interpolation, one fcurve per column of values.
+    frames holds n frame numbers and values is an (n, channels) array. The keyframe points of
+    each fcurve are allocated at once and filled with foreach_set """
+    action = get_action(target)
+    
+    frames = numpy.asarray(frames, dtype=numpy.float32)
+    order = numpy.argsort(frames, kind="stable")
+    values = numpy.asarray(values, dtype=numpy.float32)[order]
+    count = len(frames)
+    
+    co = numpy.empty((count, 2), dtype=numpy.float32)
+    co[:, 0] = frames[order]
+    interpolation = numpy.full(count, INTERPOLATION_LINEAR, dtype=numpy.int32)
+    
+    for index in range(values.shape[1]):
+        fcurve = action.fcurves.find(data_path, index = index)
+        if fcurve is None:
+            if group:
+                fcurve = action.fcurves.new(data_path, index = index, action_group = group)
+            else:
+                fcurve = action.fcurves.new(data_path, index = index)
+        else:
+            fcurve.keyframe_points.clear()
+        
+        points = fcurve.keyframe_points
+        points.add(count)
+        
+        co[:, 1] = values[:, index]
+        points.foreach_set("co", co.reshape(-1))
+        points.foreach_set("interpolation", interpolation)
+        
+        # Recalculates the handles
+        fcurve.update()
+
+def write_keyframes(target, keyframes, pivot = None):
+    """ Writes LwsKeyframes of position, rotation and scale to target.
+    If pivot is given the location is moved by the pivot, scaled per frame """
+    if len(keyframes) == 0:
+        return
+    
+    data = numpy.frombuffer(keyframes.data, dtype=numpy.float64).reshape(-1, 9)
+    
+    location = data[:, 0:3]
+    if pivot is not None:
+        location = location + data[:, 6:9] * numpy.asarray(pivot)
+    
+    # Weird conversion
+    rotation = data[:, (4, 3, 5)]
+    
+    group = "Object Transforms"
+    set_fcurves(target, "location", keyframes.frames, location, group)
+    set_fcurves(target, "rotation_euler", keyframes.frames, rotation, group)
+    set_fcurves(target, "scale", keyframes.frames, data[:, 6:9], group)
@@ -0,0 +1,112 @@
+""" Timing and peak memory benchmarks of the pure Python loaders, Blender is not needed.
+
+    python benchmarks/bench_loaders.py [--scale small|medium|large] [--repeat N] [--only lwo,uv]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LWSImporter"))
+
+import LwoLoad
+import LwsLoad
+import UvLoad
+import BmpLoad
+import ParseCache
+
+import generators
+
+""" Parameters of the generated files for each scale """
+scales = {
+    "small": {"points": 500, "polygons": 800, "surfaces": 8, "objects": 10, "keyframes": 50, "bmp": 64},
+    "medium": {"points": 5000, "polygons": 8000, "surfaces": 24, "objects": 50, "keyframes": 500, "bmp": 256},
+    "large": {"points": 50000, "polygons": 80000, "surfaces": 64, "objects": 200, "keyframes": 2000, "bmp": 1024}
+    }
+
+def write_files(folder, scale):
+    """ Writes one file of each type, returns a dict from loader name to path """
+    params = scales[scale]
+    sizes = generators.polygon_sizes(params["polygons"])
+    
+    files = {
+        "lwo": ("model.lwo", generators.make_lwo(params["points"], params["polygons"], params["surfaces"])),
+        "uv": ("model.uv", generators.make_uv(sizes, params["surfaces"])),
+        "lws": ("scene.lws", generators.make_lws(params["objects"], params["keyframes"])),
+        "bmp": ("A000_texture.bmp", generators.make_bmp(params["bmp"], params["bmp"]))
+        }
+    
+    paths = {}
+    for name, (filename, raw) in files.items():
+        path = os.path.join(folder, filename)
+        with open(path, "wb") as f:
+            f.write(raw)
+        paths[name] = path
+    return paths
+
+""" Benchmarked function for each loader """
+loaders = {
+    "lwo": LwoLoad.load_lwo,
+    "uv": UvLoad.load_uv,
+    "lws": LwsLoad.load_lws,
+    "bmp": BmpLoad.load_bmp
+    }
+
+def time_loader(loader, path, repeat):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        loader(path)
+        times.append(time.perf_counter() - start)
+    return min(times), sum(times) / len(times)
+
+def trace_loader(loader, path):
+    """ Peak traced memory while loading and the memory still held by the result """
+    tracemalloc.start()
+    try:
+        result = loader(path)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, retained
+
+def run(scale, repeat, only):
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        paths = write_files(folder, scale)
+        for name, loader in loaders.items():
+            if only and name not in only:
+                continue
+            path = paths[name]
+            size = os.path.getsize(path)
+            best, mean = time_loader(loader, path, repeat)
+            peak, retained = trace_loader(loader, path)
+            results.append((name, size, best, mean, peak, retained))
+    return results
+
+def print_results(scale, results):
+    print(f"Scale: {scale}")
+    print(f"{'loader':8}{'size KB':>10}{'best ms':>12}{'mean ms':>12}{'MB/s':>10}{'peak KB':>12}{'kept KB':>12}")
+    for name, size, best, mean, peak, retained in results:
+        throughput = size / (1024 * 1024) / best if best > 0 else 0
+        print(f"{name:8}{size / 1024:10.1f}{best * 1000:12.3f}{mean * 1000:12.3f}{throughput:10.2f}{peak / 1024:12.1f}{retained / 1024:12.1f}")
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Benchmarks the LRR asset loaders on generated files")
+    parser.add_argument("--scale", choices = list(scales), action = "append", help = "Can be given multiple times, defaults to all")
+    parser.add_argument("--repeat", type = int, default = 5, help = "Timed runs per loader, the best and mean are reported")
+    parser.add_argument("--only", default = "", help = "Comma separated loaders to run, defaults to all")
+    args = parser.parse_args(argv)
+    
+    """ Measure parsing, not the parse cache """
+    ParseCache.configure(None)
+    
+    only = [x for x in args.only.split(",") if x]
+    for scale in args.scale or list(scales):
+        print_results(scale, run(scale, args.repeat, only))
+        print()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,113 @@
+""" Per object memory of the parsed data structures, compared to the former plain classes
+that used a __dict__ per instance and a dict of tuples for keyframes.
+
+    python benchmarks/bench_memory.py [--count N] [--keyframes N]
+"""
+import os
+import sys
+import math
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LWSImporter"))
+
+import LwoLoad
+import LwsLoad
+
+""" The former data model, kept here as the baseline """
+class PlainLwoTexture:
+    
+    def __init__(self):
+        self.filepath = None
+        self.sequenced = False
+        self.interpolate = False
+        self.projAxis = "X"
+        self.size = (1, 1, 1)
+        self.center = (0, 0, 0)
+
+class PlainLwoSurface:
+    
+    def __init__(self):
+        self.name = ""
+        self.doubleSided = False
+        self.additive = False
+        self.color = (1, 1, 1)
+        self.ctex = None
+        self.lastTex = None
+
+class PlainLwsObject:
+    
+    def __init__(self):
+        self.keyframes = {}
+        self.alphaKeyframes = {}
+        self.name = None
+        self.filepath = None
+        self.parent = -1
+        self.pivot = (0, 0, 0)
+
+def fill_surface(surf, tex, i):
+    surf.name = f"Surface{i}"
+    surf.color = (i / 255, 0.5, 0.25)
+    tex.filepath = f"A000_Surface{i}.bmp"
+    tex.size = (4.0, 4.0, 4.0)
+    tex.center = (0.0, float(i), 0.0)
+    surf.ctex = tex
+    surf.lastTex = tex
+
+def plain_object(i, keyframes):
+    obj = PlainLwsObject()
+    obj.name = f"Object{i}"
+    for frame in range(keyframes):
+        floats = [float(frame + x) for x in range(9)]
+        obj.keyframes[frame] = (tuple(floats[0:3]), tuple(x * math.pi / 180.0 for x in floats[3:6]), tuple(floats[6:9]))
+        obj.alphaKeyframes[frame] = frame / keyframes
+    return obj
+
+def slotted_object(i, keyframes):
+    obj = LwsLoad.LwsObject()
+    obj.name = f"Object{i}"
+    for frame in range(keyframes):
+        floats = [float(frame + x) for x in range(9)]
+        floats[3:6] = [x * math.pi / 180.0 for x in floats[3:6]]
+        obj.keyframes.set(frame, floats)
+        obj.alphaKeyframes.set(frame, (frame / keyframes,))
+    return obj
+
+def measure(build, count):
+    """ Traced bytes per object still held after building count objects """
+    tracemalloc.start()
+    try:
+        objects = [build(i) for i in range(count)]
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return size / count
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Compares the memory of the plain and slotted data model")
+    parser.add_argument("--count", type = int, default = 10000, help = "Objects built per measurement")
+    parser.add_argument("--keyframes", type = int, default = 100, help = "Keyframes per LWS object")
+    args = parser.parse_args(argv)
+    
+    def plain_surface(i):
+        surf = PlainLwoSurface()
+        fill_surface(surf, PlainLwoTexture(), i)
+        return surf
+    
+    def slotted_surface(i):
+        surf = LwoLoad.LwoSurface()
+        fill_surface(surf, LwoLoad.LwoTexture(), i)
+        return surf
+    
+    objects = max(args.count // args.keyframes, 1)
+    rows = (
+        ("LwoSurface + LwoTexture", measure(plain_surface, args.count), measure(slotted_surface, args.count)),
+        (f"LwsObject, {args.keyframes} keys", measure(lambda i: plain_object(i, args.keyframes), objects), measure(lambda i: slotted_object(i, args.keyframes), objects))
+        )
+    
+    print(f"{'structure':32}{'before B':>12}{'after B':>12}{'ratio':>8}")
+    for name, before, after in rows:
+        print(f"{name:32}{before:12.0f}{after:12.0f}{before / after:8.2f}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
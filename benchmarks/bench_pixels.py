@@ -0,0 +1,88 @@
+""" Time to upload a decoded A###_ texture into a Blender image, comparing the former
+per pixel img.pixels writes with slice assignment and foreach_set. Runs inside Blender:
+
+    blender -b -P benchmarks/bench_pixels.py -- [--sizes 64,256] [--repeat N] [--indexed-limit 256]
+"""
+import os
+import sys
+import time
+import argparse
+
+# Blender does not add the folder of the script to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LWSImporter"))
+
+import bpy
+
+import BmpLoad
+
+import generators
+
+def upload_indexed(img, bmp_data, rgba, alpha_index):
+    """ The former upload, four indexed writes per pixel. Only palette images work, as before """
+    if bmp_data.bits > 8:
+        raise Exception("The per pixel upload needs a palette image")
+    
+    w = bmp_data.width
+    h = bmp_data.height
+    for y in range(h):
+        for x in range(w):
+            i = y * w + x
+            ind = bmp_data.pixels[i]
+            col = bmp_data.colors[ind]
+            img.pixels[i*4 + 0] = col[0]
+            img.pixels[i*4 + 1] = col[1]
+            img.pixels[i*4 + 2] = col[2]
+            
+            # Set alpha
+            if ind == alpha_index:
+                img.pixels[i*4 + 3] = 0
+            else:
+                img.pixels[i*4 + 3] = 1
+
+def upload_slice(img, bmp_data, rgba, alpha_index):
+    img.pixels[:] = rgba
+
+def upload_foreach_set(img, bmp_data, rgba, alpha_index):
+    img.pixels.foreach_set(rgba)
+    img.update()
+
+uploads = {
+    "indexed": upload_indexed,
+    "slice": upload_slice,
+    "foreach_set": upload_foreach_set
+    }
+
+def time_upload(upload, size, repeat):
+    """ Returns the best and mean seconds, the texture is decoded once outside of the timing """
+    bmp_data = BmpLoad.load_bmp(generators.make_bmp(size, size))
+    rgba = BmpLoad.decode_rgba(bmp_data, 0)
+    
+    times = []
+    for i in range(repeat):
+        img = bpy.data.images.new("A000_bench.bmp", size, size)
+        start = time.perf_counter()
+        upload(img, bmp_data, rgba, 0)
+        times.append(time.perf_counter() - start)
+        bpy.data.images.remove(img)
+    return min(times), sum(times) / len(times)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Benchmarks uploading texture pixels to Blender images")
+    parser.add_argument("--sizes", default = "64,256,1024", help = "Comma separated texture sizes")
+    parser.add_argument("--repeat", type = int, default = 3)
+    parser.add_argument("--indexed-limit", type = int, default = 256, help = "Largest size the per pixel upload is timed for")
+    args = parser.parse_args(argv)
+    
+    print(f"{'size':>6} {'upload':12} {'best ms':>12} {'mean ms':>12}")
+    for size in (int(x) for x in args.sizes.split(",")):
+        for name, upload in uploads.items():
+            if name == "indexed" and size > args.indexed_limit:
+                continue
+            best, mean = time_upload(upload, size, args.repeat)
+            print(f"{size:>6} {name:12} {best * 1000:12.2f} {mean * 1000:12.2f}")
+
+if __name__ == "__main__":
+    # Blender passes its own arguments, the script ones follow "--"
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    main(argv)
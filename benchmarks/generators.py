@@ -0,0 +1,110 @@
+""" Writers for synthetic but valid LRR asset files of any size """
+import random
+import struct
+
+def iff_chunk(name, payload, header = ">I"):
+    return name.encode("ASCII") + struct.pack(header, len(payload)) + payload
+
+def lwo_string(string):
+    """ Null terminated and padded to an even length """
+    raw = string.encode("ASCII") + b"\0"
+    if len(raw) % 2 != 0:
+        raw += b"\0"
+    return raw
+
+def polygon_sizes(polygons, seed = 0):
+    """ Vertex count of every polygon, mostly triangles and quads like the LRR models """
+    rand = random.Random(seed)
+    return [rand.choice((3, 3, 4, 4, 4, 5)) for i in range(polygons)]
+
+def make_lwo(points, polygons, surfaces, seed = 0):
+    """ LWOB file with the given amount of points, polygons and surfaces.
+    Every other surface has a planar image map """
+    rand = random.Random(seed)
+    
+    pnts = struct.pack(f">{points * 3}f", *(rand.uniform(-10, 10) for i in range(points * 3)))
+    
+    pols = bytearray()
+    for count in polygon_sizes(polygons, seed):
+        indices = [rand.randrange(points) for i in range(count)]
+        pols += struct.pack(f">H{count}HH", count, *indices, rand.randrange(1, surfaces + 1))
+    
+    names = [f"Surface{i}" for i in range(surfaces)]
+    body = iff_chunk("PNTS", pnts)
+    body += iff_chunk("SRFS", b"".join(lwo_string(x) for x in names))
+    body += iff_chunk("POLS", bytes(pols))
+    
+    for i in range(surfaces):
+        flags = (1 << 8) if i % 3 == 0 else 0
+        sub = iff_chunk("COLR", bytes((rand.randrange(256), rand.randrange(256), rand.randrange(256), 0)), ">H")
+        sub += iff_chunk("FLAG", struct.pack(">H", flags), ">H")
+        if i % 2 == 0:
+            sub += iff_chunk("CTEX", lwo_string("Planar Image Map"), ">H")
+            sub += iff_chunk("TIMG", lwo_string(f"Textures\\A000_Surface{i}.bmp"), ">H")
+            sub += iff_chunk("TFLG", struct.pack(">H", 1 << (i % 3)), ">H")
+            sub += iff_chunk("TSIZ", struct.pack(">3f", 4, 4, 4), ">H")
+            sub += iff_chunk("TCTR", struct.pack(">3f", 0, 0, 0), ">H")
+        body += iff_chunk("SURF", lwo_string(names[i]) + sub)
+    
+    return b"FORM" + struct.pack(">I", len(body) + 4) + b"LWOB" + body
+
+def make_uv(sizes, surfaces, seed = 0):
+    """ UV file for a model whose polygons have the given vertex counts """
+    rand = random.Random(seed)
+    
+    lines = ["2", str(surfaces)]
+    lines += [f"Surface{i}" for i in range(surfaces)]
+    lines += [f"Textures\\A000_Surface{i}.bmp" for i in range(surfaces)]
+    lines.append(str(len(sizes)))
+    for polygon, count in enumerate(sizes):
+        lines.append(f"{polygon} {count}")
+        for i in range(count):
+            lines.append(f"{rand.random():.6f} {rand.random():.6f} 0.000000")
+    
+    return ("\r\n".join(lines) + "\r\n").encode("ASCII")
+
+def make_lws(objects, keyframes, seed = 0):
+    """ LWS scene with the given amount of objects, each with transform and dissolve keyframes """
+    rand = random.Random(seed)
+    
+    lines = ["LWSC", "1", "", "FirstFrame 1", f"LastFrame {keyframes}", "FramesPerSecond 25", ""]
+    for i in range(objects):
+        if i % 4 == 0:
+            lines.append(f"AddNullObject Null{i}")
+        else:
+            lines.append(f"LoadObject Objects\\Object{i}.lwo")
+        lines.append("ShowObject 6 7")
+        
+        lines += ["ObjectMotion (unnamed)", "9", str(keyframes)]
+        for frame in range(keyframes):
+            lines.append(" ".join(f"{rand.uniform(-100, 100):.6f}" for x in range(9)))
+            lines.append(f"{frame} 0 0.0 0.0 0.0")
+        lines.append("EndBehavior 1")
+        
+        if i > 0:
+            lines.append(f"ParentObject {rand.randrange(1, i + 1)}")
+        lines.append(f"PivotPoint {rand.uniform(-1, 1):.6f} {rand.uniform(-1, 1):.6f} {rand.uniform(-1, 1):.6f}")
+        
+        lines += ["ObjDissolve (envelope)", "1", str(keyframes)]
+        for frame in range(keyframes):
+            lines.append(f"{rand.random():.6f}")
+            lines.append(f"{frame} 0 0.0 0.0 0.0")
+        lines.append("EndBehavior 1")
+        lines.append("")
+    
+    lines += ["AddLight", "LightName Light", "ShowCamera 1 2"]
+    return ("\r\n".join(lines) + "\r\n").encode("ASCII")
+
+def make_bmp(width, height, seed = 0, top_down = False):
+    """ Uncompressed 8 bit palettized BMP, rows are padded to 4 bytes """
+    rand = random.Random(seed)
+    
+    stride = (width + 3) & ~3
+    palette = bytes(rand.randrange(256) if i % 4 != 3 else 0 for i in range(256 * 4))
+    row_pad = b"\0" * (stride - width)
+    pixels = b"".join(rand.randbytes(width) + row_pad for y in range(height))
+    
+    offset = 14 + 40 + len(palette)
+    header = b"BM" + struct.pack("<IHHI", offset + len(pixels), 0, 0, offset)
+    info = struct.pack("<IiiHHIIiiII", 40, width, -height if top_down else height, 1, 8, 0, len(pixels), 2835, 2835, 256, 0)
+    return header + info + palette + pixels